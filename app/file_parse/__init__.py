@@ -1,3 +1,8 @@
 from .file_parse import *
+from .async_file_parse import *
+from .archive import ARCHIVE_FORMATS, select_folders, select_old_folders
+from .collisions import COLLISION_POLICIES
+from .date_buckets import GRANULARITIES, TIMESTAMP_SOURCES
+from .mirror import LINK_MODES, async_mirror_by_file_date, async_mirror_by_file_type
 
-__all__ = ["to_path", "is_valid_directory", "sort_by_file_type", "sort_by_file_date", "is_valid_path", "is_valid_file","read_file", "remove_file"]
\ No newline at end of file
+__all__ = ["to_path", "is_valid_directory", "sort_by_file_type", "sort_by_file_date", "undo_sort", "resume_sort", "discard_sort", "mirror_by_file_type", "mirror_by_file_date", "is_valid_path", "is_valid_file","read_file", "search_in_files", "remove_file", "archive_sorted_folders", "list_archive", "extract_from_archive", "select_old_folders", "select_folders", "async_sort_by_file_type", "async_sort_by_file_date", "async_undo_sort", "async_resume_sort", "async_discard_sort", "async_mirror_by_file_type", "async_mirror_by_file_date", "async_read_file", "async_remove_file", "sort_events", "read_file_chunks", "ARCHIVE_FORMATS", "COLLISION_POLICIES", "GRANULARITIES", "LINK_MODES", "TIMESTAMP_SOURCES"]
\ No newline at end of file
@@ -0,0 +1,465 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import tarfile
+import zipfile
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+from pathlib import Path
+from app.file_parse.date_buckets import next_bucket_start
+
+
+# Supported bundle formats
+ARCHIVE_FORMATS = ("tar.gz", "zip")
+
+# Suffix of the index file written next to every bundle
+INDEX_SUFFIX = ".index.json"
+
+# Size of the blocks copied from a file into a bundle
+COPY_BLOCK_SIZE = 1024 * 1024
+
+# Names of date folders produced by sorting by date, with the granularity they belong to
+DATE_FOLDER_PATTERNS = (
+    (re.compile(r"^(\d{4})-(\d{2})-(\d{2})$"), "day"),
+    (re.compile(r"^(\d{4})-W(\d{2})$"), "week"),
+    (re.compile(r"^(\d{4})-(\d{2})$"), "month"),
+    (re.compile(r"^(\d{4})-Q([1-4])$"), "quarter"),
+    (re.compile(r"^(\d{4})$"), "year"),
+)
+
+
+def date_folder_end(name: str) -> date | None:
+    """
+    The function returns the day after the period covered by a date folder, e.g. 2024-06-01 for "2024-05".
+    :param name: Folder name in one of the formats of sorting by date (YYYY-MM-DD, YYYY-Www, YYYY-MM, YYYY-Qn, YYYY).
+    :return: First day after the period, or None if the name is not a date folder.
+    """
+    for pattern, granularity in DATE_FOLDER_PATTERNS:
+        match = pattern.match(name)
+        if not match:
+            continue
+
+        numbers = [int(group) for group in match.groups()]
+        try:
+            if granularity == "day":
+                start = date(*numbers)
+            elif granularity == "week":
+                start = date.fromisocalendar(numbers[0], numbers[1], 1)
+            elif granularity == "month":
+                start = date(numbers[0], numbers[1], 1)
+            elif granularity == "quarter":
+                start = date(numbers[0], (numbers[1] - 1) * 3 + 1, 1)
+            else:
+                start = date(numbers[0], 1, 1)
+            return next_bucket_start(start, granularity)
+        except (ValueError, OverflowError):
+            return None
+    return None
+
+
+def select_old_folders(path: Path, older_than_months: int, today: date | None = None) -> list[Path]:
+    """
+    The function finds the date folders of a sorted directory whose whole period ended more than a number of months ago.
+    :param path: Path to the sorted directory.
+    :param older_than_months: Number of full months to keep; 0 selects everything before the current month.
+    :param today: The current date, today by default.
+    :return: Sorted list of folder paths.
+    """
+    today = today or date.today()
+    month_index = today.year * 12 + today.month - 1 - older_than_months
+    cutoff = date(month_index // 12, month_index % 12 + 1, 1)
+
+    folders = []
+    for entry in os.scandir(path):
+        if entry.is_dir(follow_symlinks=False):
+            end = date_folder_end(entry.name)
+            if end is not None and end <= cutoff:
+                folders.append(Path(entry.path))
+    return sorted(folders)
+
+
+def select_folders(path: Path, names: list[str]) -> list[Path]:
+    """
+    The function returns the folders of a sorted directory with the given names, e.g. "folder PDF". Names that are not folders are ignored.
+    :param path: Path to the sorted directory.
+    :param names: Folder names.
+    :return: List of folder paths.
+    """
+    return [path / name for name in names if (path / name).is_dir()]
+
+
+def bundle_path(folder: Path, archive_format: str) -> Path:
+    """
+    The function returns the path of the bundle for a folder, next to the folder.
+    :param folder: Path to the folder.
+    :param archive_format: One of ARCHIVE_FORMATS.
+    :return: Path to the bundle, e.g. "2024-05.tar.gz".
+    """
+    return folder.with_name(f"{folder.name}.{archive_format}")
+
+
+def index_path(bundle: Path) -> Path:
+    """
+    The function returns the path of the index file of a bundle.
+    :param bundle: Path to the bundle.
+    :return: Path to the index file.
+    """
+    return bundle.with_name(bundle.name + INDEX_SUFFIX)
+
+
+def is_archive_file(name: str, names: set[str]) -> bool:
+    """
+    The function checks whether a file of a sorted directory belongs to an archive: a bundle with its index next to it, the index of a bundle, or a bundle that is still being written. Sorting leaves such files in place.
+    :param name: File name.
+    :param names: Names of all files of the directory.
+    :return: True if the file belongs to an archive, otherwise False.
+    """
+    for archive_format in ARCHIVE_FORMATS:
+        suffix = f".{archive_format}"
+        if name.endswith(suffix + ".tmp"):
+            return True
+        if name.endswith(suffix) and name + INDEX_SUFFIX in names:
+            return True
+        if name.endswith(suffix + INDEX_SUFFIX):
+            bundle = name[: -len(INDEX_SUFFIX)]
+            if bundle in names or bundle + ".tmp" in names:
+                return True
+    return False
+
+
+def folder_files(folder: Path) -> list[tuple[str, str]]:
+    """
+    The function lists all files of a folder tree in a stable order.
+    :param folder: Path to the folder.
+    :return: List of (path, name inside the bundle) pairs.
+    """
+    files = []
+    for root, folders, names in os.walk(folder):
+        folders.sort()
+        for name in sorted(names):
+            file_path = os.path.join(root, name)
+            if os.path.isfile(file_path) and not os.path.islink(file_path):
+                files.append((file_path, os.path.relpath(file_path, folder).replace(os.sep, "/")))
+    return files
+
+
+def copy_with_hash(source: str, target, size: int) -> str:
+    """
+    The function copies a file into an open bundle member in blocks and hashes it on the way.
+    :param source: Path to the file.
+    :param target: Writable file object of the bundle member.
+    :param size: Expected size of the file.
+    :return: Hex SHA-256 digest of the copied data.
+    """
+    digest = hashlib.sha256()
+    copied = 0
+    with open(source, "rb") as file:
+        while block := file.read(COPY_BLOCK_SIZE):
+            digest.update(block)
+            target.write(block)
+            copied += len(block)
+    if copied != size:
+        raise OSError(f"File {source} changed while it was archived")
+    return digest.hexdigest()
+
+
+def write_tar_gz(bundle: Path, files: list[tuple[str, str]]) -> list[dict]:
+    """
+    The function writes a tar.gz bundle in which every file is a separate gzip member. The result is a regular tar.gz, and a single file can be read by seeking to its member without decompressing the rest.
+    :param bundle: Path to the bundle.
+    :param files: List of (path, name inside the bundle) pairs.
+    :return: Index entries with the keys "name", "size", "mtime", "mtime_ns", "inode", "sha256" and "offset" (position of the gzip member in the bundle).
+    """
+    members = []
+    with open(bundle, "wb") as raw:
+        for file_path, name in files:
+            stat = os.stat(file_path)
+            info = tarfile.TarInfo(name)
+            info.size = stat.st_size
+            info.mtime = int(stat.st_mtime)
+            info.mode = stat.st_mode & 0o7777
+
+            offset = raw.tell()
+            with gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as member:
+                member.write(info.tobuf(format=tarfile.PAX_FORMAT))
+                sha256 = copy_with_hash(file_path, member, info.size)
+                member.write(b"\0" * (-info.size % tarfile.BLOCKSIZE))
+
+            members.append(
+                {
+                    "name": name,
+                    "size": info.size,
+                    "mtime": info.mtime,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "inode": stat.st_ino,
+                    "sha256": sha256,
+                    "offset": offset,
+                }
+            )
+
+        # Two empty blocks mark the end of a tar archive
+        with gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as member:
+            member.write(b"\0" * tarfile.BLOCKSIZE * 2)
+    return members
+
+
+def write_zip(bundle: Path, files: list[tuple[str, str]]) -> list[dict]:
+    """
+    The function writes a zip bundle, streaming every file into it.
+    :param bundle: Path to the bundle.
+    :param files: List of (path, name inside the bundle) pairs.
+    :return: Index entries with the keys "name", "size", "mtime", "mtime_ns", "inode", "sha256" and "offset" (position of the local header in the bundle).
+    """
+    members = []
+    with zipfile.ZipFile(
+        bundle, "w", compression=zipfile.ZIP_DEFLATED, strict_timestamps=False
+    ) as archive:
+        for file_path, name in files:
+            stat = os.stat(file_path)
+            info = zipfile.ZipInfo.from_file(file_path, name)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with archive.open(info, "w", force_zip64=True) as member:
+                sha256 = copy_with_hash(file_path, member, info.file_size)
+
+            members.append(
+                {
+                    "name": name,
+                    "size": info.file_size,
+                    "mtime": int(stat.st_mtime),
+                    "mtime_ns": stat.st_mtime_ns,
+                    "inode": stat.st_ino,
+                    "sha256": sha256,
+                    "offset": info.header_offset,
+                }
+            )
+    return members
+
+
+def read_index(bundle: Path) -> dict:
+    """
+    The function reads the index file of a bundle.
+    :param bundle: Path to the bundle.
+    :return: Dictionary with the keys "format", "folder" and "members".
+    """
+    with index_path(bundle).open("r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def verify_bundle(bundle: Path, index: dict) -> bool:
+    """
+    The function reads a whole bundle back and checks that it contains exactly the indexed files with the same size and SHA-256 hash.
+    :param bundle: Path to the bundle.
+    :param index: Index of the bundle.
+    :return: True if the bundle matches the index, otherwise False.
+    """
+    expected = {member["name"]: member for member in index["members"]}
+    found = set()
+    try:
+        if index["format"] == "tar.gz":
+            # The gzip module reads all members of the bundle, tarfile's own "r|gz" stops after the first one
+            with gzip.open(bundle, "rb") as raw, tarfile.open(fileobj=raw, mode="r|") as archive:
+                for info in archive:
+                    member = expected.get(info.name)
+                    if member is None or not info.isfile() or info.size != member["size"]:
+                        return False
+                    if stream_hash(archive.extractfile(info)) != member["sha256"]:
+                        return False
+                    found.add(info.name)
+        else:
+            with zipfile.ZipFile(bundle) as archive:
+                for info in archive.infolist():
+                    member = expected.get(info.filename)
+                    if member is None or info.file_size != member["size"]:
+                        return False
+                    with archive.open(info) as file:
+                        if stream_hash(file) != member["sha256"]:
+                            return False
+                    found.add(info.filename)
+    except (OSError, EOFError, tarfile.TarError, zipfile.BadZipFile):
+        return False
+    return found == set(expected)
+
+
+def file_unchanged(path: str, member: dict) -> bool:
+    """
+    The function checks that a file still has the content it was archived with. A file whose size, modification time and inode are the same is taken as unchanged; otherwise it is hashed again and compared with the bundle.
+    :param path: Path to the file.
+    :param member: Index entry of the file.
+    :return: True if the file matches its bundle member, otherwise False.
+    """
+    stat = os.stat(path)
+    if stat.st_size != member["size"]:
+        return False
+    if stat.st_mtime_ns == member.get("mtime_ns") and stat.st_ino == member.get("inode"):
+        return True
+    with open(path, "rb") as file:
+        return stream_hash(file) == member["sha256"]
+
+
+def unarchived_items(folder: Path, members: list[dict]) -> list[str]:
+    """
+    The function lists what a folder holds besides the files of its bundle: symbolic links, special files, empty folders, and files added or changed after archiving.
+    :param folder: Path to the archived folder.
+    :param members: Index entries of the bundle.
+    :return: Paths relative to the folder, empty if the bundle covers the whole folder.
+    """
+    archived = {member["name"]: member for member in members}
+    items = []
+    for root, folders, names in os.walk(folder):
+        relative_root = os.path.relpath(root, folder)
+        if not folders and not names and relative_root != ".":
+            items.append(relative_root.replace(os.sep, "/"))
+
+        for name in folders + names:
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, folder).replace(os.sep, "/")
+            if os.path.islink(path):
+                items.append(relative)
+            elif name in names and (
+                not os.path.isfile(path)
+                or relative not in archived
+                or not file_unchanged(path, archived[relative])
+            ):
+                items.append(relative)
+    return items
+
+
+def stream_hash(file) -> str:
+    """
+    The function hashes a readable file object in blocks.
+    :param file: Readable binary file object.
+    :return: Hex SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    while block := file.read(COPY_BLOCK_SIZE):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+def archive_folder(folder: Path, archive_format: str = "tar.gz", delete: bool = False) -> dict:
+    """
+    The function packs a folder into a bundle next to it, verifies the bundle, writes the index, and deletes the folder only if the verification passed and the bundle holds everything in the folder. An existing bundle is never overwritten.
+    :param folder: Path to the folder.
+    :param archive_format: One of ARCHIVE_FORMATS.
+    :param delete: If True, the folder is deleted after a successful verification.
+    :return: Result dictionary with the keys "folder", "bundle", "files", "size", "verified", "deleted" and "error" (None on success).
+    """
+    folder = Path(folder)
+    bundle = bundle_path(folder, archive_format)
+    result = {
+        "folder": str(folder),
+        "bundle": str(bundle),
+        "files": 0,
+        "size": 0,
+        "verified": False,
+        "deleted": False,
+        "error": None,
+    }
+    if bundle.exists():
+        result["error"] = f"Bundle {bundle.name} already exists"
+        return result
+
+    temporary_bundle = bundle.with_name(bundle.name + ".tmp")
+    replaced = False
+    try:
+        files = folder_files(folder)
+        if archive_format == "tar.gz":
+            members = write_tar_gz(temporary_bundle, files)
+        else:
+            members = write_zip(temporary_bundle, files)
+
+        result.update(files=len(members), size=sum(member["size"] for member in members))
+        index = {"format": archive_format, "folder": folder.name, "members": members}
+        # The bundle is checked under its temporary name, so a failed one leaves nothing behind to block a retry
+        result["verified"] = verify_bundle(temporary_bundle, index)
+        if not result["verified"]:
+            temporary_bundle.unlink(missing_ok=True)
+            result["error"] = f"Bundle {bundle.name} failed verification"
+            return result
+
+        index_path(bundle).write_text(json.dumps(index), encoding="utf-8")
+        os.replace(temporary_bundle, bundle)
+        replaced = True
+        if delete:
+            unarchived = unarchived_items(folder, members)
+            if unarchived:
+                result["error"] = (
+                    f"Bundle {bundle.name} is verified, but the folder was not deleted: "
+                    f"{len(unarchived)} items are not in the bundle (symbolic links, special files, "
+                    f"empty folders or changed files), e.g. {unarchived[0]}"
+                )
+            else:
+                shutil.rmtree(folder)
+                result["deleted"] = True
+    except OSError as error:
+        if not replaced:
+            temporary_bundle.unlink(missing_ok=True)
+            index_path(bundle).unlink(missing_ok=True)
+        result["error"] = str(error)
+    return result
+
+
+def archive_folders(
+    folders: list[Path],
+    archive_format: str = "tar.gz",
+    delete: bool = False,
+    workers: int | None = None,
+) -> Iterator[dict]:
+    """
+    The function archives several folders in parallel, one process per folder, and yields the result of every folder as soon as it is done.
+    :param folders: Paths to the folders.
+    :param archive_format: One of ARCHIVE_FORMATS.
+    :param delete: If True, every folder is deleted after its bundle is verified.
+    :param workers: Number of worker processes. The number of CPUs is used if not specified.
+    :return: Iterator of result dictionaries (see archive_folder).
+    """
+    if archive_format not in ARCHIVE_FORMATS:
+        raise ValueError(f"Unknown archive format - {archive_format}")
+    if not folders:
+        return
+
+    workers = min(workers or os.cpu_count() or 1, len(folders))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(archive_folder, folder, archive_format, delete)
+            for folder in folders
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def extract_member(bundle: Path, name: str, target: Path) -> Path:
+    """
+    The function extracts a single file from a bundle using its index. For tar.gz bundles only the gzip member of that file is decompressed.
+    :param bundle: Path to the bundle.
+    :param name: Name of the file inside the bundle, as listed in the index.
+    :param target: Directory where the file will be written.
+    :return: Path to the extracted file.
+    """
+    index = read_index(bundle)
+    member = next((item for item in index["members"] if item["name"] == name), None)
+    if member is None:
+        raise KeyError(name)
+
+    output = (target / name).resolve()
+    if not output.is_relative_to(target.resolve()):
+        raise ValueError(f"Unsafe file name in bundle - {name}")
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(output, "wb") as file:
+        if index["format"] == "tar.gz":
+            with open(bundle, "rb") as raw:
+                raw.seek(member["offset"])
+                with tarfile.open(fileobj=gzip.GzipFile(fileobj=raw), mode="r|") as archive:
+                    source = archive.extractfile(archive.next())
+                    shutil.copyfileobj(source, file, COPY_BLOCK_SIZE)
+        else:
+            with zipfile.ZipFile(bundle) as archive, archive.open(name) as source:
+                shutil.copyfileobj(source, file, COPY_BLOCK_SIZE)
+
+    os.utime(output, (member["mtime"], member["mtime"]))
+    return output
@@ -0,0 +1,637 @@
+import asyncio
+import errno
+import os
+import shutil
+from collections.abc import AsyncIterator, Callable, Iterable
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import aclosing
+from functools import partial
+from pathlib import Path
+from app.file_parse.archive import is_archive_file
+from app.file_parse.collisions import resolve_destinations
+from app.file_parse.date_buckets import bucket_timestamps, file_timestamps
+from app.file_parse.journal import (
+    JOURNAL_GROUP_SIZE,
+    JOURNAL_NAME,
+    open_journal,
+    pending_moves,
+    read_journal,
+    remove_journal,
+    start_journal,
+    undo_moves,
+    write_records,
+)
+
+
+# Upper bound on the number of blocking file operations running at the same time
+MAX_WORKERS = 8
+
+# Size of a single chunk when a file is streamed (characters for text, bytes for binary files)
+CHUNK_SIZE = 64 * 1024
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    The function returns the shared thread pool used for blocking file operations, creating it on first use.
+    :return: A thread pool limited to MAX_WORKERS threads.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=MAX_WORKERS, thread_name_prefix="file-organize"
+        )
+    return _executor
+
+
+async def run_blocking(
+    func: Callable, *args, executor: Executor | None = None, **kwargs
+):
+    """
+    The function runs a blocking call in the executor so that the event loop is not blocked.
+    :param func: The blocking function to call.
+    :param args: Positional arguments of the function.
+    :param executor: The executor to run the call in. The shared thread pool is used if not specified.
+    :param kwargs: Keyword arguments of the function.
+    :return: The value returned by the function.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor or get_executor(), partial(func, *args, **kwargs)
+    )
+
+
+def list_files(path: Path) -> list[os.DirEntry]:
+    """
+    The function scans a directory once and returns all of its entries that are not directories. The sort journal and archive bundles with their indexes are skipped.
+    :param path: Path to the directory.
+    :return: List of directory entries.
+    """
+    with os.scandir(path) as entries:
+        entries = [
+            entry
+            for entry in entries
+            if not entry.is_dir() and entry.name != JOURNAL_NAME
+        ]
+    names = {entry.name for entry in entries}
+    return [entry for entry in entries if not is_archive_file(entry.name, names)]
+
+
+def plan_by_file_type(entries: list[os.DirEntry]) -> list[str]:
+    """
+    The function returns a folder name for every file based on its extension. Files without an extension go to the folder "folder NO_EXTENSION".
+    :param entries: Files of the directory being sorted.
+    :return: Folder names in the same order as the entries.
+    """
+    folders = []
+    for entry in entries:
+        new_suffix = Path(entry.name).suffix.replace(".", "").upper() or "NO_EXTENSION"
+        folders.append(f"folder {new_suffix}")
+    return folders
+
+
+def plan_by_file_date(
+    entries: list[os.DirEntry], granularity: str = "month", source: str = "mtime"
+) -> list[str | None]:
+    """
+    The function returns a folder name for every file based on its date. The folders of all files are computed in one batch (see bucket_timestamps).
+    :param entries: Files of the directory being sorted.
+    :param granularity: One of GRANULARITIES, month (YYYY-MM) by default.
+    :param source: One of TIMESTAMP_SOURCES, the last modification time by default.
+    :return: Folder names in the same order as the entries, None for files whose date cannot be read.
+    """
+    return bucket_timestamps(file_timestamps(entries, source), granularity)
+
+
+def plan_sort(
+    path: Path,
+    planner: Callable[[list[os.DirEntry]], list[str | None]],
+    collision: str = "skip",
+) -> tuple[list[tuple[str, str]], list[dict]]:
+    """
+    The function scans a directory and plans where every file will be moved, applying the collision policy to names that are already taken.
+    :param path: Path to the directory whose files will be sorted.
+    :param planner: Function that returns the destination folder name for every file, or None for a file that cannot be planned.
+    :param collision: One of COLLISION_POLICIES.
+    :return: List of (source, destination) pairs of file paths, and "skipped" events for files left in place (reason "unreadable" for files the planner could not place).
+    """
+    entries = list_files(path)
+    folders = planner(entries)
+    moves = []
+    unreadable = []
+    for entry, folder in zip(entries, folders):
+        if folder is None:
+            unreadable.append(
+                {
+                    "event": "skipped",
+                    "source": entry.path,
+                    "destination": entry.path,
+                    "reason": "unreadable",
+                }
+            )
+        else:
+            moves.append((entry.path, str(path / folder / entry.name)))
+
+    moves, skipped = resolve_destinations(moves, collision)
+    return moves, unreadable + skipped
+
+
+def create_folders(destinations: list[str]) -> None:
+    """
+    The function creates all destination folders of a sort at once, skipping the ones that already exist.
+    :param destinations: Destination file paths of the sort.
+    :return: None
+    """
+    for folder in {os.path.dirname(destination) for destination in destinations}:
+        os.makedirs(folder, exist_ok=True)
+
+
+def move_item(source: str, destination: str, overwrite: bool = False) -> dict:
+    """
+    The function moves a file to a new path and describes the outcome as an event instead of raising or printing.
+    The new path is checked right before the move, so a file that appeared there after planning is not lost.
+    :param source: Path to the file.
+    :param destination: The new path of the file.
+    :param overwrite: If True, a file that already exists at the new path is replaced, otherwise the move fails with the reason "file_exists".
+    :return: Event dictionary with the keys "event", "source", "destination" and, for failures, "reason" and "error".
+    """
+    event = {"event": "moved", "source": source, "destination": destination}
+    try:
+        if not overwrite and os.path.lexists(destination):
+            raise FileExistsError(errno.EEXIST, "File exists", destination)
+        shutil.move(source, destination)
+    except PermissionError as error:
+        event.update(event="failed", reason="permission_denied", error=str(error))
+    except FileExistsError as error:
+        event.update(event="failed", reason="file_exists", error=str(error))
+    except OSError as error:
+        event.update(event="failed", reason="os_error", error=str(error))
+    return event
+
+
+def resume_item(source: str, destination: str, overwrite: bool = False) -> dict:
+    """
+    The function repeats a journaled move of an interrupted sort. A move that already happened before the interruption is reported as done.
+    :param source: Path to the file before the sort.
+    :param destination: Path to the file after the sort.
+    :param overwrite: If True, a file that already exists at the new path is replaced (see move_item).
+    :return: Event dictionary of the move (see move_item).
+    """
+    if not os.path.lexists(source) and os.path.lexists(destination):
+        return {"event": "moved", "source": source, "destination": destination}
+    return move_item(source, destination, overwrite)
+
+
+def restore_item(source: str, destination: str) -> dict:
+    """
+    The function reverses a journaled move by moving the file back to its original path. An existing file at the original path is never overwritten.
+    :param source: Path to the file before the sort.
+    :param destination: Path to the file after the sort.
+    :return: Event dictionary with the event "restored", "unchanged" (the file was never moved) or "failed".
+    """
+    event = {"event": "restored", "source": destination, "destination": source}
+    if not os.path.lexists(destination) and os.path.lexists(source):
+        event["event"] = "unchanged"
+    elif os.path.lexists(source):
+        event.update(
+            event="failed", reason="file_exists", error=f"{source} already exists"
+        )
+    else:
+        try:
+            shutil.move(destination, source)
+        except PermissionError as error:
+            event.update(event="failed", reason="permission_denied", error=str(error))
+        except OSError as error:
+            event.update(event="failed", reason="os_error", error=str(error))
+    return event
+
+
+def remove_empty_folders(destinations: list[str]) -> None:
+    """
+    The function deletes the destination folders of a sort that became empty after an undo.
+    :param destinations: Destination file paths of the sort.
+    :return: None
+    """
+    for folder in {os.path.dirname(destination) for destination in destinations}:
+        try:
+            os.rmdir(folder)
+        except OSError:
+            pass
+
+
+async def run_window(
+    jobs: Iterable[tuple], executor: Executor | None = None
+) -> AsyncIterator[tuple[int, dict]]:
+    """
+    The function runs blocking jobs in the executor with at most MAX_WORKERS in flight and yields their results as they finish.
+    If the consumer stops or the task is cancelled, jobs that have not started yet are dropped.
+    :param jobs: Iterable of (key, function, *arguments) tuples.
+    :param executor: The executor for blocking calls. The shared thread pool is used if not specified.
+    :return: Asynchronous iterator of (key, result) pairs.
+    """
+    loop = asyncio.get_running_loop()
+    executor = executor or get_executor()
+    pending = {}
+    try:
+        for key, func, *args in jobs:
+            if len(pending) >= MAX_WORKERS:
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for future in done:
+                    yield pending.pop(future), future.result()
+
+            pending[loop.run_in_executor(executor, func, *args)] = key
+
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+async def sort_events(
+    path: Path,
+    planner: Callable[[list[os.DirEntry]], list[str]] | None,
+    collision: str = "skip",
+    executor: Executor | None = None,
+    settings: dict | None = None,
+) -> AsyncIterator[dict]:
+    """
+    The function sorts the files of a directory into folders and yields an event for every step as soon as it happens.
+    The plan is written to the journal before the first move, and finished moves are recorded in groups of JOURNAL_GROUP_SIZE.
+    If the journal holds an interrupted sort with the same settings, that sort is resumed from the journal without scanning the directory again. An interrupted sort with other settings is left alone.
+    :param path: Path to the directory whose files will be sorted.
+    :param planner: Function that returns the destination folder name for every file. If None, only an interrupted sort is resumed, whatever its settings.
+    :param collision: One of COLLISION_POLICIES, applied when a destination name is already taken. A resumed sort keeps the names of its plan.
+    :param executor: The executor for blocking calls. The shared thread pool is used if not specified.
+    :param settings: Settings of the sort recorded in the journal, e.g. {"sort": "type", "collision": "skip"}. If None, any interrupted sort is resumed.
+    :return: Asynchronous iterator of event dictionaries: "planned" or "resumed", "skipped" for files left in place, then "moved" or "failed" for every other file. A single "unfinished" event (with the settings of the interrupted sort) or "nothing_to_resume" event is yielded if nothing could be sorted.
+    """
+    path = Path(path)
+    journal = await run_blocking(read_journal, path, executor=executor)
+
+    if journal and not journal["complete"]:
+        if planner is not None and settings is not None and journal["settings"] != settings:
+            yield {"event": "unfinished", "path": str(path), "settings": journal["settings"]}
+            return
+
+        moves = pending_moves(journal)
+        overwrite = (journal["settings"] or {}).get("collision") == "overwrite"
+        jobs = (
+            (index, resume_item, source, dest, overwrite)
+            for index, source, dest in moves
+        )
+        events = [{"event": "resumed", "path": str(path), "total": len(moves)}]
+        file = await run_blocking(open_journal, path, executor=executor)
+    elif planner is None:
+        yield {"event": "nothing_to_resume", "path": str(path)}
+        return
+    else:
+        moves, skipped = await run_blocking(
+            plan_sort, path, planner, collision, executor=executor
+        )
+        total = len(moves) + len(skipped)
+        if not moves:
+            # Nothing to move: the journal of the previous sort is kept for undo
+            yield {"event": "planned", "path": str(path), "total": total}
+            for event in skipped:
+                yield event
+            return
+
+        jobs = (
+            (index, move_item, source, dest, collision == "overwrite")
+            for index, (source, dest) in enumerate(moves)
+        )
+        events = [{"event": "planned", "path": str(path), "total": total}, *skipped]
+        file = await run_blocking(
+            start_journal, path, moves, settings, executor=executor
+        )
+
+    # The journal is closed even if the consumer stops right after the first events
+    batch = {"moved": [], "failed": []}
+    try:
+        for event in events:
+            yield event
+
+        await run_blocking(
+            create_folders, [move[-1] for move in moves], executor=executor
+        )
+
+        async with aclosing(run_window(jobs, executor)) as results:
+            async for index, event in results:
+                batch["moved" if event["event"] == "moved" else "failed"].append(index)
+                if len(batch["moved"]) + len(batch["failed"]) >= JOURNAL_GROUP_SIZE:
+                    records = [{"op": "done", **batch}]
+                    batch = {"moved": [], "failed": []}
+                    await run_blocking(write_records, file, records, executor=executor)
+                yield event
+
+        records = [{"op": "done", **batch}, {"op": "end"}]
+        batch = {"moved": [], "failed": []}
+        await run_blocking(write_records, file, records, executor=executor)
+    finally:
+        if batch["moved"] or batch["failed"]:
+            write_records(file, [{"op": "done", **batch}])
+        file.close()
+
+
+async def undo_events(
+    path: Path, executor: Executor | None = None
+) -> AsyncIterator[dict]:
+    """
+    The function reverses the last journaled sort of a directory, newest move first, and yields an event for every file.
+    Reversed moves are recorded in the journal, so an interrupted undo can be repeated. The journal is deleted once everything is restored.
+    :param path: Path to the sorted directory.
+    :param executor: The executor for blocking calls. The shared thread pool is used if not specified.
+    :return: Asynchronous iterator of event dictionaries: "undo_planned" (or "nothing_to_undo"), then "restored", "unchanged" or "failed" for every file.
+    """
+    path = Path(path)
+    journal = await run_blocking(read_journal, path, executor=executor)
+    if journal is None:
+        yield {"event": "nothing_to_undo", "path": str(path)}
+        return
+
+    moves = undo_moves(journal)
+    yield {"event": "undo_planned", "path": str(path), "total": len(moves)}
+
+    file = await run_blocking(open_journal, path, executor=executor)
+    jobs = ((index, restore_item, source, dest) for index, source, dest in moves)
+    batch = []
+    failed = False
+    try:
+        async with aclosing(run_window(jobs, executor)) as results:
+            async for index, event in results:
+                if event["event"] == "failed":
+                    failed = True
+                else:
+                    batch.append(index)
+
+                if len(batch) >= JOURNAL_GROUP_SIZE:
+                    records = [{"op": "undone", "ids": batch}]
+                    batch = []
+                    await run_blocking(write_records, file, records, executor=executor)
+                yield event
+    finally:
+        if batch:
+            write_records(file, [{"op": "undone", "ids": batch}])
+        file.close()
+
+    if not failed:
+        destinations = [dest for _, dest in journal["moves"].values()]
+        await run_blocking(remove_empty_folders, destinations, executor=executor)
+        await run_blocking(remove_journal, path, executor=executor)
+
+
+async def sort_files(
+    path: Path,
+    planner: Callable[[list[os.DirEntry]], list[str]] | None,
+    collision: str = "skip",
+    on_event: Callable[[dict], None] | None = None,
+    executor: Executor | None = None,
+    settings: dict | None = None,
+) -> dict:
+    """
+    The function sorts the files of a directory and collects the events into a single result.
+    :param path: Path to the directory whose files will be sorted.
+    :param planner: Function that returns the destination folder name for every file. If None, only an interrupted sort is resumed.
+    :param collision: One of COLLISION_POLICIES, applied when a destination name is already taken.
+    :param on_event: Optional callback that receives every event as it happens.
+    :param executor: The executor for blocking calls. The shared thread pool is used if not specified.
+    :param settings: Settings of the sort recorded in the journal (see sort_events).
+    :return: Result dictionary with the keys "path", "journal" (False if there was nothing to resume), "unfinished" (True if an interrupted sort with other settings blocked the sort), "settings" (settings of that interrupted sort), "resumed", "total", "moved" (number of moved files), "skipped" (list of skip events) and "failed" (list of failure events).
+    """
+    result = {
+        "path": str(path),
+        "journal": True,
+        "unfinished": False,
+        "settings": None,
+        "resumed": False,
+        "total": 0,
+        "moved": 0,
+        "skipped": [],
+        "failed": [],
+    }
+    events = sort_events(path, planner, collision, executor, settings)
+    async with aclosing(events) as events:
+        async for event in events:
+            if on_event:
+                on_event(event)
+
+            if event["event"] == "unfinished":
+                result["unfinished"] = True
+                result["settings"] = event["settings"]
+            elif event["event"] == "nothing_to_resume":
+                result["journal"] = False
+            elif event["event"] in ("planned", "resumed"):
+                result["resumed"] = event["event"] == "resumed"
+                result["total"] = event["total"]
+            elif event["event"] == "moved":
+                result["moved"] += 1
+            elif event["event"] == "skipped":
+                result["skipped"].append(event)
+            elif event["event"] == "failed":
+                result["failed"].append(event)
+    return result
+
+
+async def async_undo_sort(
+    path: Path,
+    on_event: Callable[[dict], None] | None = None,
+    executor: Executor | None = None,
+) -> dict:
+    """
+    The function reverses the last sort of a directory using its journal and collects the events into a single result.
+    :param path: Path to the sorted directory.
+    :param on_event: Optional callback that receives every event as it happens.
+    :param executor: The executor for blocking calls. The shared thread pool is used if not specified.
+    :return: Result dictionary with the keys "path", "journal" (False if there was nothing to undo), "total", "restored" and "failed" (list of failure events).
+    """
+    result = {"path": str(path), "journal": True, "total": 0, "restored": 0, "failed": []}
+    async with aclosing(undo_events(path, executor)) as events:
+        async for event in events:
+            if on_event:
+                on_event(event)
+
+            if event["event"] == "nothing_to_undo":
+                result["journal"] = False
+            elif event["event"] == "undo_planned":
+                result["total"] = event["total"]
+            elif event["event"] == "restored":
+                result["restored"] += 1
+            elif event["event"] == "failed":
+                result["failed"].append(event)
+    return result
+
+
+async def async_sort_by_file_type(
+    path: Path,
+    collision: str = "skip",
+    on_event: Callable[[dict], None] | None = None,
+    executor: Executor | None = None,
+) -> dict:
+    """
+    The function sorts files by their type without blocking the event loop. See sort_files for the result.
+    :param path: Path to the directory whose files will be sorted.
+    :param collision: What to do with a name that is already taken: "skip", "overwrite", "rename" or "skip_identical".
+    :param on_event: Optional callback that receives every event as it happens.
+    :param executor: The executor for blocking calls. The shared thread pool is used if not specified.
+    :return: Result dictionary of the sort.
+    """
+    settings = {"sort": "type", "collision": collision}
+    return await sort_files(
+        path, plan_by_file_type, collision, on_event, executor, settings
+    )
+
+
+async def async_sort_by_file_date(
+    path: Path,
+    granularity: str = "month",
+    source: str = "mtime",
+    collision: str = "skip",
+    on_event: Callable[[dict], None] | None = None,
+    executor: Executor | None = None,
+) -> dict:
+    """
+    The function sorts files by their date without blocking the event loop. See sort_files for the result.
+    :param path: Path to the directory whose files will be sorted.
+    :param granularity: Folder granularity: "day", "week", "month", "quarter" or "year".
+    :param source: Timestamp of the file: "mtime", "ctime" or "birth".
+    :param collision: What to do with a name that is already taken: "skip", "overwrite", "rename" or "skip_identical".
+    :param on_event: Optional callback that receives every event as it happens.
+    :param executor: The executor for blocking calls. The shared thread pool is used if not specified.
+    :return: Result dictionary of the sort.
+    """
+    planner = partial(plan_by_file_date, granularity=granularity, source=source)
+    settings = {
+        "sort": "date",
+        "granularity": granularity,
+        "source": source,
+        "collision": collision,
+    }
+    return await sort_files(path, planner, collision, on_event, executor, settings)
+
+
+async def async_resume_sort(
+    path: Path,
+    on_event: Callable[[dict], None] | None = None,
+    executor: Executor | None = None,
+) -> dict:
+    """
+    The function finishes an interrupted sort of a directory from its journal, whatever its settings. See sort_files for the result.
+    :param path: Path to the directory whose sort was interrupted.
+    :param on_event: Optional callback that receives every event as it happens.
+    :param executor: The executor for blocking calls. The shared thread pool is used if not specified.
+    :return: Result dictionary of the sort.
+    """
+    return await sort_files(path, None, on_event=on_event, executor=executor)
+
+
+async def async_discard_sort(path: Path, executor: Executor | None = None) -> bool:
+    """
+    The function deletes the journal of a directory, so that an interrupted sort is neither resumed nor undone.
+    :param path: Path to the sorted directory.
+    :param executor: The executor for blocking calls. The shared thread pool is used if not specified.
+    :return: True if there was a journal to delete, otherwise False.
+    """
+    journal = await run_blocking(read_journal, path, executor=executor)
+    await run_blocking(remove_journal, path, executor=executor)
+    return journal is not None
+
+
+async def read_file_chunks(
+    path: Path,
+    binary: bool = False,
+    chunk_size: int = CHUNK_SIZE,
+    executor: Executor | None = None,
+) -> AsyncIterator[str | bytes]:
+    """
+    The function streams a file in chunks, reading each chunk in the executor.
+    :param path: Path to the file.
+    :param binary: If True, the file is read as bytes, otherwise as UTF-8 text.
+    :param chunk_size: Maximum size of a single chunk.
+    :param executor: The executor for blocking calls. The shared thread pool is used if not specified.
+    :return: Asynchronous iterator of text or bytes chunks.
+    """
+    if binary:
+        file = await run_blocking(open, path, "rb", executor=executor)
+    else:
+        file = await run_blocking(open, path, "r", encoding="utf-8", executor=executor)
+
+    try:
+        while chunk := await run_blocking(file.read, chunk_size, executor=executor):
+            yield chunk
+    finally:
+        file.close()
+
+
+async def async_read_file(path: str | Path, executor: Executor | None = None) -> dict:
+    """
+    The function reads a whole file without blocking the event loop. Files with the .bin extension are read as bytes, all others as UTF-8 text.
+    :param path: Path to the file.
+    :param executor: The executor for blocking calls. The shared thread pool is used if not specified.
+    :return: Result dictionary with the keys "path", "binary", "content" (None on failure), "reason" and "error" (None on success).
+    """
+    path = Path(path)
+    binary = path.suffix == ".bin"
+    result = {
+        "path": str(path),
+        "binary": binary,
+        "content": None,
+        "reason": None,
+        "error": None,
+    }
+
+    try:
+        async with aclosing(
+            read_file_chunks(path, binary, executor=executor)
+        ) as chunks:
+            parts = [chunk async for chunk in chunks]
+    except FileNotFoundError as error:
+        result.update(reason="not_found", error=str(error))
+    except (OSError, UnicodeDecodeError) as error:
+        result.update(reason="open_error", error=str(error))
+    else:
+        result["content"] = (b"" if binary else "").join(parts)
+    return result
+
+
+def remove_item(path: str, recursive: bool) -> dict:
+    """
+    The function deletes a file or a directory and describes the outcome as an event instead of raising.
+    :param path: Path to the directory or file to be deleted.
+    :param recursive: If True, a directory is deleted together with its contents.
+    :return: Event dictionary with the keys "event", "path" and, for failures, "reason" and "error".
+    """
+    event = {"event": "removed", "path": path}
+    try:
+        if os.path.isdir(path) and not os.path.islink(path):
+            if recursive:
+                shutil.rmtree(path)
+            else:
+                os.rmdir(path)
+        else:
+            os.unlink(path)
+    except FileNotFoundError as error:
+        event.update(event="failed", reason="not_found", error=str(error))
+    except PermissionError as error:
+        event.update(event="failed", reason="permission_denied", error=str(error))
+    except OSError as error:
+        event.update(event="failed", reason="os_error", error=str(error))
+    return event
+
+
+async def async_remove_file(
+    path: Path, recursive: bool, executor: Executor | None = None
+) -> dict:
+    """
+    The function deletes a directory or file without blocking the event loop.
+    :param path: Path to the directory or file to be deleted.
+    :param recursive: If True, a directory is deleted together with its contents.
+    :param executor: The executor for blocking calls. The shared thread pool is used if not specified.
+    :return: Event dictionary of the deletion (see remove_item).
+    """
+    return await run_blocking(remove_item, str(path), recursive, executor=executor)
@@ -0,0 +1,110 @@
+import hashlib
+import os
+
+
+# What to do when the destination folder already has a file with the same name:
+# skip - leave the file in place, overwrite - replace the existing file,
+# rename - add a counter to the name ("report (1).txt"),
+# skip_identical - leave the file in place if the content is the same, otherwise rename
+COLLISION_POLICIES = ("skip", "overwrite", "rename", "skip_identical")
+
+# Size of the blocks read when files are compared by content
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def folder_names(cache: dict[str, set[str]], folder: str) -> set[str]:
+    """
+    The function returns the names of the files in a destination folder, listing the folder only the first time it is requested. Names are stored with os.path.normcase, so that on Windows names that differ only in case are seen as taken.
+    :param cache: Names of the folders listed during the current run.
+    :param folder: Path to the destination folder.
+    :return: Set of normalized names, shared with the cache so that new names can be added to it.
+    """
+    if folder not in cache:
+        try:
+            cache[folder] = {os.path.normcase(name) for name in os.listdir(folder)}
+        except FileNotFoundError:
+            cache[folder] = set()
+    return cache[folder]
+
+
+def free_name(names: set[str], name: str) -> str:
+    """
+    The function returns a name that is not taken in a folder by adding a counter before the extension.
+    :param names: Normalized names taken in the folder (see folder_names).
+    :param name: The desired file name.
+    :return: A free name, e.g. "report (2).txt".
+    """
+    stem, suffix = os.path.splitext(name)
+    counter = 1
+    while os.path.normcase(f"{stem} ({counter}){suffix}") in names:
+        counter += 1
+    return f"{stem} ({counter}){suffix}"
+
+
+def file_hash(path: str) -> str:
+    """
+    The function returns the SHA-256 hash of a file, reading it in blocks.
+    :param path: Path to the file.
+    :return: Hex digest of the content.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while block := file.read(HASH_BLOCK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def same_content(first: str, second: str) -> bool:
+    """
+    The function checks whether two files have the same content. Files of different size are not hashed.
+    :param first: Path to the first file.
+    :param second: Path to the second file.
+    :return: True if the content is identical, otherwise False.
+    """
+    try:
+        if os.path.getsize(first) != os.path.getsize(second):
+            return False
+        return file_hash(first) == file_hash(second)
+    except OSError:
+        return False
+
+
+def resolve_destinations(
+    moves: list[tuple[str, str]], policy: str = "skip"
+) -> tuple[list[tuple[str, str]], list[dict]]:
+    """
+    The function applies a collision policy to planned moves. Each destination folder is listed once, and every name given to a file is added to the cache, so later files of the same run see it as taken.
+    :param moves: Planned moves as (source, destination) pairs of file paths.
+    :param policy: One of COLLISION_POLICIES.
+    :return: Moves to perform, and "skipped" events for files left in place (reason "file_exists" or "identical").
+    """
+    if policy not in COLLISION_POLICIES:
+        raise ValueError(f"Unknown collision policy - {policy}")
+
+    cache = {}
+    resolved = []
+    skipped = []
+    for source, destination in moves:
+        folder, name = os.path.split(destination)
+        names = folder_names(cache, folder)
+
+        if os.path.normcase(name) in names and policy != "overwrite":
+            if policy == "skip" or (
+                policy == "skip_identical" and same_content(source, destination)
+            ):
+                skipped.append(
+                    {
+                        "event": "skipped",
+                        "source": source,
+                        "destination": destination,
+                        "reason": "file_exists" if policy == "skip" else "identical",
+                    }
+                )
+                continue
+
+            name = free_name(names, name)
+            destination = os.path.join(folder, name)
+
+        names.add(os.path.normcase(name))
+        resolved.append((source, destination))
+    return resolved, skipped
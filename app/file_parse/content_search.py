@@ -0,0 +1,159 @@
+import mmap
+import os
+import re
+from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+
+
+# Number of bytes read from the start of a file to decide whether it is binary
+SNIFF_SIZE = 8192
+
+# Headers of common binary formats that may have no zero byte at the start
+BINARY_SIGNATURES = (
+    b"\x7fELF",
+    b"MZ",
+    b"%PDF",
+    b"\x89PNG",
+    b"\xff\xd8\xff",
+    b"GIF8",
+    b"PK\x03\x04",
+    b"\x1f\x8b",
+    b"7z\xbc\xaf",
+    b"Rar!",
+)
+
+# Number of files searched by a worker process in one task
+FILES_PER_TASK = 16
+
+# Maximum number of characters of a matching line kept in a result
+MAX_LINE_LENGTH = 200
+
+
+def walk_files(root: str) -> Iterator[str]:
+    """
+    The function yields the paths of all regular files in a directory tree. Symbolic links are not followed.
+    :param root: Path to the directory.
+    :return: Iterator of file paths.
+    """
+    folders = [root]
+    while folders:
+        try:
+            with os.scandir(folders.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        folders.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry.path
+        except OSError:
+            continue
+
+
+def is_binary(header: bytes) -> bool:
+    """
+    The function decides whether a file is binary by its first bytes: a known binary signature or a zero byte.
+    :param header: The first bytes of the file.
+    :return: True if the file is binary, otherwise False.
+    """
+    return header.startswith(BINARY_SIGNATURES) or b"\0" in header
+
+
+def search_file(path: str, pattern: bytes, flags: int = 0) -> list[dict]:
+    """
+    The function finds all matches of a byte pattern in a text file using a read-only memory map. Binary, empty, and unreadable files are skipped.
+    :param path: Path to the file.
+    :param pattern: Regular expression as bytes.
+    :param flags: Flags of the regular expression.
+    :return: List of matches with the keys "path", "line" (starting from 1), "offset" (byte offset in the file) and "text" (the matching line).
+    """
+    regex = re.compile(pattern, flags)
+    matches = []
+    try:
+        with open(path, "rb") as file:
+            header = file.read(SNIFF_SIZE)
+            if not header or is_binary(header):
+                return matches
+
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                line = 1
+                counted_to = 0
+                for match in regex.finditer(data):
+                    start = match.start()
+                    line += data[counted_to:start].count(b"\n")
+                    counted_to = start
+
+                    line_start = data.rfind(b"\n", 0, start) + 1
+                    line_end = data.find(b"\n", start)
+                    if line_end == -1:
+                        line_end = len(data)
+                    text = data[line_start:min(line_end, line_start + MAX_LINE_LENGTH)]
+
+                    matches.append(
+                        {
+                            "path": path,
+                            "line": line,
+                            "offset": start,
+                            "text": text.decode("utf-8", errors="replace").rstrip("\r"),
+                        }
+                    )
+    except (OSError, ValueError):
+        return []
+    return matches
+
+
+def search_batch(paths: list[str], pattern: bytes, flags: int = 0) -> list[dict]:
+    """
+    The function searches several files in a worker process.
+    :param paths: Paths to the files.
+    :param pattern: Regular expression as bytes.
+    :param flags: Flags of the regular expression.
+    :return: List of matches of all files (see search_file).
+    """
+    matches = []
+    for path in paths:
+        matches.extend(search_file(path, pattern, flags))
+    return matches
+
+
+def search_files(
+    root: str,
+    pattern: str,
+    is_regex: bool = True,
+    ignore_case: bool = False,
+    workers: int | None = None,
+) -> Iterator[dict]:
+    """
+    The function searches the text files of a directory tree in a pool of processes and yields matches as soon as each group of files is searched, while the tree is still being walked.
+    :param root: Path to the directory.
+    :param pattern: Text or regular expression to search for.
+    :param is_regex: If False, the pattern is searched as plain text.
+    :param ignore_case: If True, the case of letters is ignored.
+    :param workers: Number of worker processes. The number of CPUs is used if not specified.
+    :return: Iterator of matches (see search_file). Files finish in any order; the matches of one file are in order.
+    """
+    pattern_bytes = pattern.encode("utf-8")
+    if not is_regex:
+        pattern_bytes = re.escape(pattern_bytes)
+    flags = re.IGNORECASE if ignore_case else 0
+    # Invalid patterns fail here with re.error instead of inside a worker
+    re.compile(pattern_bytes, flags)
+
+    workers = workers or os.cpu_count() or 1
+    files = walk_files(str(root))
+    pool = ProcessPoolExecutor(max_workers=workers)
+    pending = set()
+    try:
+        while batch := list(islice(files, FILES_PER_TASK)):
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+
+            pending.add(pool.submit(search_batch, batch, pattern_bytes, flags))
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,145 @@
+import os
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from app.logs import logger
+
+
+# Supported folder granularities for sorting by date
+GRANULARITIES = ("day", "week", "month", "quarter", "year")
+
+# Supported sources of the file timestamp
+TIMESTAMP_SOURCES = ("mtime", "ctime", "birth")
+
+
+def entry_stat(entry: os.DirEntry) -> os.stat_result | None:
+    """
+    The function returns the status of a file. A broken symbolic link gets the status of the link itself.
+    :param entry: A file of the directory being sorted.
+    :return: Status of the file, or None if it cannot be read.
+    """
+    try:
+        return entry.stat()
+    except OSError:
+        pass
+
+    try:
+        return entry.stat(follow_symlinks=False)
+    except OSError as error:
+        logger.warning(f"Could not read the date of {entry.path} – {error}")
+        return None
+
+
+def file_timestamps(
+    entries: list[os.DirEntry], source: str = "mtime"
+) -> list[float | None]:
+    """
+    The function returns the timestamp of every file from the chosen source. If the birth time is not available on the platform, the modification time is used instead.
+    :param entries: Files of the directory being sorted.
+    :param source: "mtime" (last modification), "ctime" (metadata change on Unix, creation on Windows) or "birth" (creation).
+    :return: Timestamps in seconds in the same order as the entries, None for files whose status cannot be read.
+    """
+    if source not in TIMESTAMP_SOURCES:
+        raise ValueError(f"Unknown timestamp source - {source}")
+
+    stats = [entry_stat(entry) for entry in entries]
+    attribute = {"mtime": "st_mtime", "ctime": "st_ctime", "birth": "st_birthtime"}[source]
+    if source == "birth" and not all(
+        hasattr(stat, "st_birthtime") for stat in stats if stat is not None
+    ):
+        logger.warning(
+            "File birth time is not available on this platform, the modification time is used instead."
+        )
+        attribute = "st_mtime"
+
+    return [None if stat is None else getattr(stat, attribute) for stat in stats]
+
+
+def bucket_start(day: date, granularity: str) -> date:
+    """
+    The function returns the first day of the bucket that contains a date.
+    :param day: A date.
+    :param granularity: One of GRANULARITIES.
+    :return: First day of the bucket.
+    """
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    if granularity == "quarter":
+        return date(day.year, (day.month - 1) // 3 * 3 + 1, 1)
+    return date(day.year, 1, 1)
+
+
+def next_bucket_start(start: date, granularity: str) -> date:
+    """
+    The function returns the first day of the bucket that follows a bucket.
+    :param start: First day of a bucket.
+    :param granularity: One of GRANULARITIES.
+    :return: First day of the next bucket.
+    """
+    if granularity == "day":
+        return start + timedelta(days=1)
+    if granularity == "week":
+        return start + timedelta(days=7)
+    if granularity == "year":
+        return date(start.year + 1, 1, 1)
+
+    months = 1 if granularity == "month" else 3
+    month_index = start.month - 1 + months
+    return date(start.year + month_index // 12, month_index % 12 + 1, 1)
+
+
+def bucket_label(start: date, granularity: str) -> str:
+    """
+    The function returns the folder name of a bucket: YYYY-MM-DD, YYYY-Www (ISO week), YYYY-MM, YYYY-Qn or YYYY.
+    :param start: First day of the bucket.
+    :param granularity: One of GRANULARITIES.
+    :return: Folder name of the bucket.
+    """
+    if granularity == "day":
+        return start.strftime("%Y-%m-%d")
+    if granularity == "week":
+        iso_year, iso_week, _ = start.isocalendar()
+        return f"{iso_year}-W{iso_week:02d}"
+    if granularity == "month":
+        return start.strftime("%Y-%m")
+    if granularity == "quarter":
+        return f"{start.year}-Q{(start.month - 1) // 3 + 1}"
+    return str(start.year)
+
+
+def bucket_timestamps(
+    timestamps: list[float | None], granularity: str = "month"
+) -> list[str | None]:
+    """
+    The function assigns every timestamp to a bucket in local time. The bucket boundaries between the oldest and the newest timestamp are computed once, and each timestamp is placed with a binary search instead of being formatted as a date.
+    :param timestamps: Timestamps in seconds, None for files without a date.
+    :param granularity: One of GRANULARITIES.
+    :return: Folder names in the same order as the timestamps, None where the timestamp is None.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity - {granularity}")
+    known = [seconds for seconds in timestamps if seconds is not None]
+    if not known:
+        return [None] * len(timestamps)
+
+    start = bucket_start(datetime.fromtimestamp(min(known)).date(), granularity)
+    last = datetime.fromtimestamp(max(known)).date()
+
+    boundaries = []
+    labels = []
+    while start <= last:
+        boundaries.append(datetime.combine(start, datetime.min.time()).timestamp())
+        labels.append(bucket_label(start, granularity))
+        try:
+            start = next_bucket_start(start, granularity)
+        except (ValueError, OverflowError):
+            # The bucket reaches the end of the calendar (year 9999), so it is the last one
+            break
+
+    return [
+        None if seconds is None else labels[max(bisect_right(boundaries, seconds) - 1, 0)]
+        for seconds in timestamps
+    ]
@@ -1,7 +1,23 @@
 from pathlib import Path
-import shutil
-from datetime import datetime
+import asyncio
+import re
+import tarfile
+import zipfile
 from app.logs import logger
+from app.file_parse.async_file_parse import (
+    async_discard_sort,
+    async_read_file,
+    async_remove_file,
+    async_resume_sort,
+    async_sort_by_file_date,
+    async_sort_by_file_type,
+    async_undo_sort,
+    move_item,
+)
+from app.file_parse.archive import archive_folders, extract_member, read_index
+from app.file_parse.collisions import resolve_destinations
+from app.file_parse.content_search import search_files
+from app.file_parse.mirror import async_mirror_by_file_date, async_mirror_by_file_type
 
 
 def to_path(path: str) -> Path:
@@ -71,67 +87,336 @@ def create_folder(path: Path, folder: str) -> Path:
     return path_for_folder
 
 
-def move_file(item: Path, path_folder: Path) -> None:
+def report_failure(event: dict) -> None:
+    """
+    The function displays and logs a warning for a failed or skipped file operation event.
+    :param event: Event dictionary of a failed or skipped move.
+    :return: None
+    """
+    item = to_path(event["source"])
+    destination = to_path(event["destination"])
+    if event["reason"] == "permission_denied":
+        message = f"Permission denied: {item} -> {destination}"
+    elif event["reason"] == "file_exists":
+        message = f"File {destination.name} already exists in {destination.parent}"
+    else:
+        message = f"Error while moving {item} to {destination}"
+
+    print(f"\n{message}")
+    logger.warning(message)
+    print()
+
+
+def move_file(item: Path, path_folder: Path, collision: str = "skip") -> None:
     """
     The function takes the path to a file and the destination path, moves the file, and displays a warning if the operation fails.
     :param item: A file in a directory.
     :param path_folder: The directory where the file will be moved.
+    :param collision: What to do if the directory already has a file with the same name: "skip", "overwrite", "rename" or "skip_identical".
     :return: None
     """
-    try:
-        shutil.move(item, path_folder)
-    except PermissionError:
-        print(f"\nPermission denied: {item} -> {path_folder}")
-        logger.warning(f"Permission denied: {item} -> {path_folder}")
-        print()
-    except FileExistsError:
-        print(f"\nFile {item.name} already exists in {path_folder}")
-        logger.warning(f"\nFile {item.name} already exists in {path_folder}")
-        print()
-    except OSError:
-        print(f"\nError while moving {item} to {path_folder}")
-        logger.warning(f"\nError while moving {item} to {path_folder}")
+    moves, skipped = resolve_destinations(
+        [(str(item), str(path_folder / item.name))], collision
+    )
+    for event in skipped:
+        if event["reason"] == "file_exists":
+            report_failure(event)
+
+    for source, destination in moves:
+        event = move_item(source, destination, collision == "overwrite")
+        if event["event"] == "failed":
+            report_failure(event)
+
+
+def describe_sort(settings: dict | None) -> str:
+    """
+    The function describes the settings of a sort recorded in its journal in words.
+    :param settings: Settings of the sort, or None for a journal written without them.
+    :return: Description of the sort, e.g. "by date (month, mtime), collision policy skip".
+    """
+    if not settings:
+        return "with unknown settings"
+    if settings.get("sort") == "date":
+        kind = f"by date ({settings.get('granularity')}, {settings.get('source')})"
+    else:
+        kind = "by type"
+    return f"{kind}, collision policy {settings.get('collision')}"
+
+
+def report_sort(result: dict) -> bool:
+    """
+    The function displays the warnings collected during a sort and reports its completion.
+    :param result: Result dictionary of the sort.
+    :return: False if the sort was not started because an interrupted sort with other settings was found, otherwise True.
+    """
+    if result["unfinished"]:
+        message = f"An interrupted sort {describe_sort(result['settings'])} was found in {result['path']}. The new sort was not started."
+        print(f"\n{message}")
+        logger.warning(message)
         print()
+        return False
+
+    if result["resumed"]:
+        print("An interrupted sort was found and resumed from its journal.")
+        logger.info(f"Interrupted sort of {result['path']} resumed from its journal.")
+
+    for event in result["skipped"]:
+        if event["reason"] == "file_exists":
+            report_failure(event)
+        elif event["reason"] == "unreadable":
+            message = f"File {event['source']} was skipped: its date could not be read"
+            print(f"\n{message}")
+            logger.warning(message)
+            print()
+        else:
+            logger.info(
+                f"File {event['source']} skipped: an identical file already exists at {event['destination']}"
+            )
+
+    for event in result["failed"]:
+        report_failure(event)
+
+    logger.info(
+        f"Sorting of {result['path']} completed: {result['moved']} of {result['total']} files moved."
+    )
+    print("Sorting completed!")
+    return True
 
 
-def sort_by_file_type(path: Path) -> None:
+def sort_by_file_type(path: Path, collision: str = "skip") -> bool:
     """
     The function sorts files by their type, creating a corresponding folder for each file type. If a file has no extension, it is placed in a folder named NO_EXTENSION.
     :param path: Path to the directory whose files will be sorted.
+    :param collision: What to do if a folder already has a file with the same name: "skip", "overwrite", "rename" (add a counter) or "skip_identical" (skip if the content is the same, otherwise rename).
+    :return: False if an interrupted sort with other settings must be resumed, undone or discarded first, otherwise True.
+    """
+    return report_sort(asyncio.run(async_sort_by_file_type(path, collision)))
+
+
+def sort_by_file_date(
+    path: Path, granularity: str = "month", source: str = "mtime", collision: str = "skip"
+) -> bool:
+    """
+    The function sorts files by their date, organizing them into folders by day (YYYY-MM-DD), ISO week (YYYY-Www), month (YYYY-MM), quarter (YYYY-Qn) or year (YYYY).
+    :param path: Path to the directory whose files will be sorted.
+    :param granularity: Folder granularity: "day", "week", "month", "quarter" or "year".
+    :param source: Timestamp of the file: "mtime" (last modification), "ctime" or "birth" (creation, where available).
+    :param collision: What to do if a folder already has a file with the same name: "skip", "overwrite", "rename" (add a counter) or "skip_identical" (skip if the content is the same, otherwise rename).
+    :return: False if an interrupted sort with other settings must be resumed, undone or discarded first, otherwise True.
+    """
+    return report_sort(
+        asyncio.run(async_sort_by_file_date(path, granularity, source, collision))
+    )
+
+
+def resume_sort(path: Path) -> None:
+    """
+    The function finishes an interrupted sort of a directory with the settings it was started with.
+    :param path: Path to the directory whose sort was interrupted.
     :return: None
     """
-    for item in path.iterdir():
-        if item.is_dir():
-            continue
+    result = asyncio.run(async_resume_sort(path))
+    if not result["journal"]:
+        print("\nThere is no interrupted sort in this directory.")
+        logger.warning(f"No interrupted sort found in {path}")
+        print()
+        return
 
-        suffix_file = item.suffix
-        new_suffix = suffix_file.replace(".", "").upper() or "NO_EXTENSION"
-        new_name_folder = f"folder {new_suffix}"
+    report_sort(result)
 
-        path_folder = create_folder(path, new_name_folder)
-        move_file(item, path_folder)
 
-    print("Sorting completed!")
+def discard_sort(path: Path) -> None:
+    """
+    The function deletes the sort journal of a directory. Files stay where they are, and the sort can no longer be resumed or undone.
+    :param path: Path to the sorted directory.
+    :return: None
+    """
+    if asyncio.run(async_discard_sort(path)):
+        print("The sort journal was discarded.")
+        logger.info(f"Sort journal of {path} discarded.")
+    else:
+        print("\nThere is no sort journal in this directory.")
+        logger.warning(f"No sort journal found in {path}")
+        print()
 
 
-def sort_by_file_date(path: Path) -> None:
+def report_mirror(result: dict) -> None:
     """
-    The function sorts files by their last modification date, organizing them into folders by month in the YYYY-MM format.
-    :param path: Path to the directory whose files will be sorted.
+    The function displays the warnings collected while building a mirror and reports how the files were linked.
+    :param result: Result dictionary of the mirror.
+    :return: None
+    """
+    for event in result["failed"]:
+        message = f"Could not link {event.get('source', event['destination'])} – {event['error']}"
+        print(f"\n{message}")
+        logger.warning(message)
+        print()
+
+    methods = ", ".join(f"{method}: {count}" for method, count in result["linked"].items())
+    logger.info(
+        f"Mirror of {result['source']} in {result['destination']} refreshed: {result['unchanged']} of {result['total']} files unchanged, {result['unlinked']} stale links removed, linked - {methods or 'none'}."
+    )
+    print(f"Mirror completed! Files unchanged: {result['unchanged']}, linked: {methods or 'none'}.")
+
+
+def mirror_by_file_type(source: Path, destination: Path, link_mode: str = "auto") -> None:
+    """
+    The function builds a copy of a directory sorted by file type in another directory without changing the source. Files are not copied: reflink clones, hard links, or symbolic links are created. Running it again only updates files that changed.
+    :param source: Path to the directory to mirror.
+    :param destination: Path to the directory where the sorted mirror is built.
+    :param link_mode: "auto" (reflink, then hard link, then symbolic link), "reflink", "hardlink" or "symlink".
     :return: None
     """
-    for item in path.iterdir():
-        if item.is_dir():
+    report_mirror(asyncio.run(async_mirror_by_file_type(source, destination, link_mode)))
+
+
+def mirror_by_file_date(
+    source: Path,
+    destination: Path,
+    granularity: str = "month",
+    timestamp_source: str = "mtime",
+    link_mode: str = "auto",
+) -> None:
+    """
+    The function builds a copy of a directory sorted by file date in another directory without changing the source. Files are not copied: reflink clones, hard links, or symbolic links are created. Running it again only updates files that changed.
+    :param source: Path to the directory to mirror.
+    :param destination: Path to the directory where the sorted mirror is built.
+    :param granularity: Folder granularity: "day", "week", "month", "quarter" or "year".
+    :param timestamp_source: Timestamp of the file: "mtime", "ctime" or "birth".
+    :param link_mode: "auto" (reflink, then hard link, then symbolic link), "reflink", "hardlink" or "symlink".
+    :return: None
+    """
+    report_mirror(
+        asyncio.run(
+            async_mirror_by_file_date(
+                source, destination, granularity, timestamp_source, link_mode
+            )
+        )
+    )
+
+
+def undo_sort(path: Path) -> None:
+    """
+    The function moves the files of the last sort of a directory back to their original places using the sort journal.
+    :param path: Path to the sorted directory.
+    :return: None
+    """
+    result = asyncio.run(async_undo_sort(path))
+    if not result["journal"]:
+        print("\nThere is no sort to undo in this directory.")
+        logger.warning(f"No sort journal found in {path}")
+        print()
+        return
+
+    for event in result["failed"]:
+        report_failure(event)
+
+    logger.info(
+        f"Undo of the sort in {path} completed: {result['restored']} of {result['total']} files restored."
+    )
+    print("Undo completed!")
+
+
+def search_in_files(path: Path, pattern: str, is_regex: bool = True) -> int:
+    """
+    The function searches the text files of a directory tree for a text or regular expression and displays every match as soon as it is found.
+    :param path: Path to the directory.
+    :param pattern: Text or regular expression to search for.
+    :param is_regex: If False, the pattern is searched as plain text.
+    :return: Number of matches found.
+    """
+    try:
+        matches = search_files(path, pattern, is_regex)
+        count = 0
+        for match in matches:
+            print(f"{match['path']}:{match['line']}:{match['offset']}: {match['text']}")
+            count += 1
+    except re.error as error:
+        print(f"\nInvalid regular expression – {error}.")
+        logger.warning(f"Invalid regular expression '{pattern}' – {error}.")
+        print()
+        return 0
+
+    print(f"\nMatches found: {count}\n")
+    logger.info(f"Search for '{pattern}' in {path} finished: {count} matches found.")
+    return count
+
+
+def archive_sorted_folders(
+    folders: list[Path], archive_format: str = "tar.gz", delete: bool = False
+) -> None:
+    """
+    The function packs sorted folders into compressed bundles in parallel and reports the result of every folder as soon as it is done. A folder is deleted only after its bundle has been verified.
+    :param folders: Paths to the folders to archive, e.g. from select_old_folders or select_folders.
+    :param archive_format: "tar.gz" or "zip".
+    :param delete: If True, the original folders are deleted after verification.
+    :return: None
+    """
+    if not folders:
+        print("\nThere are no folders to archive.\n")
+        logger.warning("No folders matched the archive selection.")
+        return
+
+    for result in archive_folders(folders, archive_format, delete):
+        if result["error"]:
+            print(f"\nArchive error – {result['folder']}: {result['error']}.")
+            logger.error(f"Archive error – {result['folder']}: {result['error']}.")
+            print()
             continue
 
-        seconds = item.stat().st_mtime
-        to_datetime = datetime.fromtimestamp(seconds)
-        new_name_folder = datetime.strftime(to_datetime, "%Y-%m")
+        state = "verified, original deleted" if result["deleted"] else "verified"
+        print(f"{result['bundle']}: {result['files']} files, {result['size']} bytes ({state})")
+        logger.info(
+            f"Folder {result['folder']} archived to {result['bundle']}: {result['files']} files, {state}."
+        )
 
-        path_folder = create_folder(path, new_name_folder)
-        move_file(item, path_folder)
+    print("Archiving completed!")
 
-    print("Sorting completed!")
+
+def list_archive(bundle: Path) -> None:
+    """
+    The function displays the files of a bundle from its index without opening the bundle.
+    :param bundle: Path to the bundle.
+    :return: None
+    """
+    try:
+        index = read_index(bundle)
+    except (OSError, ValueError, KeyError) as error:
+        print(f"\nCould not read the index of {bundle.name} – {error}.")
+        logger.warning(f"Could not read the index of {bundle} – {error}.")
+        print()
+        return
+
+    print("-" * 40 + f"\nFiles in {bundle.name}:\n" + "-" * 40)
+    for member in index["members"]:
+        print(f"  {member['name']}  ({member['size']} bytes)")
+    print("-" * 40)
+    logger.info(f"User listed {len(index['members'])} files of {bundle}.")
+
+
+def extract_from_archive(bundle: Path, name: str, target: Path) -> None:
+    """
+    The function extracts a single file from a bundle without decompressing the whole bundle.
+    :param bundle: Path to the bundle.
+    :param name: Name of the file inside the bundle, as shown by list_archive.
+    :param target: Directory where the file will be written.
+    :return: None
+    """
+    try:
+        output = extract_member(bundle, name, target)
+    except KeyError:
+        print(f"\nFile {name} is not found in {bundle.name}.")
+        logger.warning(f"File {name} is not found in {bundle}.")
+        print()
+        return
+    except (OSError, ValueError, tarfile.TarError, zipfile.BadZipFile) as error:
+        print(f"\nExtraction error – {error}.")
+        logger.error(f"Extraction error – {error}.")
+        print()
+        return
+
+    print(f"File extracted to {output}\n")
+    logger.info(f"File {name} extracted from {bundle} to {output}.")
 
 
 def read_file(path: str) -> str | None:
@@ -140,47 +425,34 @@ def read_file(path: str) -> str | None:
     :param path: Path to a file as a string (str).
     :return: The text content of a file, or None if the file is empty or not found.
     """
-    path = to_path(path)
-    try:
-        if path.suffix == ".txt" or path.suffix == ".log":
-            with open(path, "r", encoding="utf-8") as file:
-                text = file.read()
-        elif path.suffix == ".bin":
-            with open(path, "rb") as file:
-                text = file.read()
-        else:
-
-            try:
-                with open(path, "r", encoding="utf-8") as file:
-                    unknown_text = file.read()
-                print(unknown_text)
-            except Exception as e:
-                print(f"\nFile open error – {e}.")
-                logger.error(f"File open error – {e}.")
-                print()
-
+    result = asyncio.run(async_read_file(path))
+    if result["reason"] == "not_found":
+        print(f"\nFile {to_path(path).name} not found")
+        logger.warning(f"File {to_path(path).name} not found")
         print()
-        return "File content:\n" + text
+        return None
 
-    except FileNotFoundError:
-        print(f"\nFile {path.name} not found")
-        logger.warning(f"File {path.name} not found")
+    if result["reason"]:
+        print(f"\nFile open error – {result['error']}.")
+        logger.error(f"File open error – {result['error']}.")
         print()
         return None
 
+    print()
+    return "File content:\n" + str(result["content"])
+
 
-def remove_file(path: Path, recursive: bool) -> None:
+def remove_file(path: Path, recursive: bool) -> bool:
     """
     The function deletes a directory or file. If the directory contains any content, it asks for permission to delete it along with its contents.
     :param path: Path to the directory or file to be deleted.
     :param recursive: A flag that allows deleting a directory with its contents: if the flag is True, deletion of the directory and its contents is permitted; if False, deletion is prohibited.
-    :return: None
+    :return: True if the path was deleted or did not exist, False if the deletion failed.
     """
-    if path.is_dir():
-        if recursive:
-            shutil.rmtree(path)
-        else:
-            path.rmdir()
-
-    if path.is_file():
-        path.unlink(missing_ok=True)
+    event = asyncio.run(async_remove_file(path, recursive))
+    if event["event"] == "failed" and event["reason"] != "not_found":
+        print(f"\nError while deleting {path} – {event['error']}.")
+        logger.error(f"Error while deleting {path} – {event['error']}.")
+        print()
+        return False
+    return True
@@ -0,0 +1,143 @@
+import json
+import os
+from pathlib import Path
+from typing import TextIO
+
+
+# Name of the journal file kept in the root of a sorted directory
+JOURNAL_NAME = ".file-organize-journal"
+
+# Number of finished moves written to the journal with a single fsync
+JOURNAL_GROUP_SIZE = 256
+
+
+def journal_path(path: Path) -> Path:
+    """
+    The function returns the path of the journal file for a sorted directory.
+    :param path: Path to the sorted directory.
+    :return: Path to the journal file.
+    """
+    return Path(path) / JOURNAL_NAME
+
+
+def write_records(file: TextIO, records: list[dict]) -> None:
+    """
+    The function appends records to the journal as JSON lines and forces them to disk with a single fsync.
+    :param file: The journal file opened for appending.
+    :param records: Journal records.
+    :return: None
+    """
+    file.write("".join(json.dumps(record) + "\n" for record in records))
+    file.flush()
+    os.fsync(file.fileno())
+
+
+def start_journal(
+    path: Path, moves: list[tuple[str, str]], settings: dict | None = None
+) -> TextIO:
+    """
+    The function replaces the journal of a directory with the plan of a new sort. The whole plan is on disk before the first file is moved.
+    :param path: Path to the sorted directory.
+    :param moves: Planned moves as (source, destination) pairs of file paths.
+    :param settings: Settings of the sort (kind, granularity, timestamp source, collision policy), kept so that an interrupted sort is only resumed by the same sort.
+    :return: The journal file opened for appending finished moves.
+    """
+    file = journal_path(path).open("w", encoding="utf-8")
+    records = [{"op": "begin", "path": str(path), "settings": settings}]
+    records.extend(
+        {"op": "move", "id": index, "source": source, "destination": destination}
+        for index, (source, destination) in enumerate(moves)
+    )
+    records.append({"op": "planned"})
+    write_records(file, records)
+    return file
+
+
+def open_journal(path: Path) -> TextIO:
+    """
+    The function opens the existing journal of a directory for appending records.
+    :param path: Path to the sorted directory.
+    :return: The journal file opened for appending.
+    """
+    return journal_path(path).open("a", encoding="utf-8")
+
+
+def read_journal(path: Path) -> dict | None:
+    """
+    The function reads the journal of a directory. A torn last line left by a crash is ignored.
+    :param path: Path to the sorted directory.
+    :return: None if there is no complete plan, otherwise a dictionary with the keys "settings" (None for journals written without them), "moves" (id -> (source, destination)), "planned", "moved", "failed", "undone" (sets of ids) and "complete".
+    """
+    file_path = journal_path(path)
+    if not file_path.exists():
+        return None
+
+    journal = {
+        "settings": None,
+        "moves": {},
+        "planned": False,
+        "moved": set(),
+        "failed": set(),
+        "undone": set(),
+        "complete": False,
+    }
+    with file_path.open("r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break
+
+            if record["op"] == "begin":
+                journal["settings"] = record.get("settings")
+            elif record["op"] == "move":
+                journal["moves"][record["id"]] = (record["source"], record["destination"])
+            elif record["op"] == "planned":
+                journal["planned"] = True
+            elif record["op"] == "done":
+                journal["moved"].update(record["moved"])
+                journal["failed"].update(record["failed"])
+            elif record["op"] == "undone":
+                journal["undone"].update(record["ids"])
+            elif record["op"] == "end":
+                journal["complete"] = True
+
+    if not journal["planned"]:
+        return None
+    return journal
+
+
+def pending_moves(journal: dict) -> list[tuple[int, str, str]]:
+    """
+    The function returns the moves of an interrupted sort that have no recorded outcome.
+    :param journal: Journal dictionary returned by read_journal.
+    :return: List of (id, source, destination) tuples in plan order.
+    """
+    settled = journal["moved"] | journal["failed"]
+    return [
+        (index, source, destination)
+        for index, (source, destination) in journal["moves"].items()
+        if index not in settled
+    ]
+
+
+def undo_moves(journal: dict) -> list[tuple[int, str, str]]:
+    """
+    The function returns the moves to reverse, newest first. Moves without a recorded outcome are included because they may have happened right before a crash.
+    :param journal: Journal dictionary returned by read_journal.
+    :return: List of (id, source, destination) tuples in reverse plan order.
+    """
+    return [
+        (index, source, destination)
+        for index, (source, destination) in reversed(journal["moves"].items())
+        if index not in journal["failed"] and index not in journal["undone"]
+    ]
+
+
+def remove_journal(path: Path) -> None:
+    """
+    The function deletes the journal of a directory if it exists.
+    :param path: Path to the sorted directory.
+    :return: None
+    """
+    journal_path(path).unlink(missing_ok=True)
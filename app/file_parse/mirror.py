@@ -0,0 +1,399 @@
+import errno
+import json
+import os
+import shutil
+import sys
+import tempfile
+from collections.abc import AsyncIterator, Callable
+from concurrent.futures import Executor
+from contextlib import aclosing
+from functools import partial
+from pathlib import Path
+from app.file_parse.async_file_parse import (
+    create_folders,
+    list_files,
+    plan_by_file_date,
+    plan_by_file_type,
+    remove_empty_folders,
+    run_blocking,
+    run_window,
+)
+from app.file_parse.collisions import resolve_destinations
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# Name of the manifest file kept in the root of a mirror
+MANIFEST_NAME = ".file-organize-mirror.json"
+
+# auto tries a reflink clone, then a hardlink, then a symbolic link
+LINK_MODES = ("auto", "reflink", "hardlink", "symlink")
+
+# ioctl request that clones a file on Linux filesystems with reflink support (Btrfs, XFS)
+FICLONE = 0x40049409
+
+# Errors meaning that a link method cannot work for this pair of directories at all
+UNSUPPORTED_ERRORS = {
+    errno.EXDEV,
+    errno.EOPNOTSUPP,
+    errno.ENOTSUP,
+    errno.ENOTTY,
+    errno.EINVAL,
+    errno.EPERM,
+}
+
+
+def reflink(source: str, destination: str) -> None:
+    """
+    The function creates a copy-on-write clone of a file. The clone shares data blocks with the original until one of them is changed.
+    :param source: Path to the file.
+    :param destination: Path to the clone. It must not exist.
+    :return: None
+    """
+    if fcntl is None or sys.platform != "linux":
+        raise OSError(errno.EOPNOTSUPP, "Reflinks are not supported on this platform")
+
+    with open(source, "rb") as source_file, open(destination, "xb") as clone:
+        try:
+            fcntl.ioctl(clone.fileno(), FICLONE, source_file.fileno())
+        except OSError:
+            clone.close()
+            os.unlink(destination)
+            raise
+    shutil.copystat(source, destination)
+
+
+def hardlink(source: str, destination: str) -> None:
+    """
+    The function creates a hard link to a file.
+    :param source: Path to the file.
+    :param destination: Path to the link. It must not exist.
+    :return: None
+    """
+    os.link(source, destination)
+
+
+def symlink(source: str, destination: str) -> None:
+    """
+    The function creates a symbolic link to a file using its absolute path.
+    :param source: Path to the file.
+    :param destination: Path to the link. It must not exist.
+    :return: None
+    """
+    os.symlink(os.path.abspath(source), destination)
+
+
+LINKERS = {"reflink": reflink, "hardlink": hardlink, "symlink": symlink}
+
+
+def link_item(source: str, destination: str, mode: str, disabled: set[str]) -> dict:
+    """
+    The function creates a link to a file in the mirror. In the auto mode, a method that cannot work between the two directories is disabled for the rest of the run.
+    :param source: Path to the file.
+    :param destination: Path to the link.
+    :param mode: One of LINK_MODES.
+    :param disabled: Link methods found unsupported during the current run.
+    :return: Event dictionary with the keys "event" ("linked" or "failed"), "source", "destination", "method" and, for failures, "reason" and "error".
+    """
+    event = {"event": "linked", "source": source, "destination": destination, "method": None}
+    methods = ("reflink", "hardlink", "symlink") if mode == "auto" else (mode,)
+    last_error = None
+    for method in methods:
+        if mode == "auto" and method in disabled:
+            continue
+
+        try:
+            LINKERS[method](source, destination)
+        except FileExistsError as error:
+            last_error = error
+            break
+        except OSError as error:
+            last_error = error
+            if mode == "auto" and error.errno in UNSUPPORTED_ERRORS:
+                disabled.add(method)
+            continue
+
+        event["method"] = method
+        return event
+
+    reason = "file_exists" if isinstance(last_error, FileExistsError) else "os_error"
+    event.update(event="failed", reason=reason, error=str(last_error))
+    return event
+
+
+def unlink_item(destination: str) -> dict:
+    """
+    The function deletes a link from the mirror. A link that is already gone is not an error.
+    :param destination: Path to the link.
+    :return: Event dictionary with the keys "event" ("unlinked" or "failed") and "destination".
+    """
+    event = {"event": "unlinked", "destination": destination}
+    try:
+        os.unlink(destination)
+    except FileNotFoundError:
+        pass
+    except OSError as error:
+        event.update(event="failed", reason="os_error", error=str(error))
+    return event
+
+
+def read_manifest(destination: Path) -> dict:
+    """
+    The function reads the manifest of a mirror.
+    :param destination: Root directory of the mirror.
+    :return: Dictionary of source file name -> {"folder", "destination", "signature"}, empty for a new mirror.
+    """
+    try:
+        with (destination / MANIFEST_NAME).open("r", encoding="utf-8") as file:
+            return json.load(file)["files"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return {}
+
+
+def write_manifest(destination: Path, source: Path, files: dict) -> None:
+    """
+    The function atomically replaces the manifest of a mirror.
+    :param destination: Root directory of the mirror.
+    :param source: Source directory of the mirror.
+    :param files: Dictionary of source file name -> {"folder", "destination", "signature"}.
+    :return: None
+    """
+    descriptor, temporary_path = tempfile.mkstemp(dir=destination, suffix=".tmp")
+    with os.fdopen(descriptor, "w", encoding="utf-8") as file:
+        json.dump({"source": str(source), "files": files}, file)
+    os.replace(temporary_path, destination / MANIFEST_NAME)
+
+
+def plan_mirror(
+    source: Path,
+    destination: Path,
+    planner: Callable[[list[os.DirEntry]], list[str | None]],
+) -> tuple[dict, list[str], dict, list[dict], int]:
+    """
+    The function compares the source directory with the manifest of the mirror. Files whose size, modification time and folder are unchanged keep their links; changed, deleted and unreadable files lose them.
+    :param source: Directory to mirror.
+    :param destination: Root directory of the mirror.
+    :param planner: Function that returns the folder name for every file, or None for a file that cannot be planned.
+    :return: The manifest entries to keep, links to delete, files to link (name -> (path, folder, signature)), "failed" events for unreadable files, and the number of source files.
+    """
+    old_files = read_manifest(destination)
+    entries = list_files(source)
+    folders = planner(entries)
+
+    kept = {}
+    wanted = {}
+    failed = []
+    for entry, folder in zip(entries, folders):
+        try:
+            if folder is None:
+                raise OSError(f"The date of {entry.path} could not be read")
+            stat = entry.stat()
+        except OSError as error:
+            failed.append(
+                {
+                    "event": "failed",
+                    "source": entry.path,
+                    "destination": None,
+                    "reason": "unreadable",
+                    "error": str(error),
+                }
+            )
+            continue
+
+        signature = [stat.st_size, stat.st_mtime_ns]
+        old = old_files.get(entry.name)
+        if (
+            old
+            and old["signature"] == signature
+            and old["folder"] == folder
+            and os.path.lexists(destination / old["destination"])
+        ):
+            kept[entry.name] = old
+        else:
+            wanted[entry.name] = (entry.path, folder, signature)
+
+    stale = [
+        str(destination / old["destination"])
+        for name, old in old_files.items()
+        if name not in kept
+    ]
+    return kept, stale, wanted, failed, len(entries)
+
+
+async def mirror_events(
+    source: Path,
+    destination: Path,
+    planner: Callable[[list[os.DirEntry]], list[str]],
+    link_mode: str = "auto",
+    executor: Executor | None = None,
+) -> AsyncIterator[dict]:
+    """
+    The function builds or refreshes a sorted mirror of a directory in another directory, yielding an event for every step. The source directory is not changed.
+    Only files that are new or changed since the last run are linked again; the manifest is saved even if the run is interrupted.
+    :param source: Directory to mirror.
+    :param destination: Root directory of the mirror.
+    :param planner: Function that returns the folder name for every file.
+    :param link_mode: One of LINK_MODES.
+    :param executor: The executor for blocking calls. The shared thread pool is used if not specified.
+    :return: Asynchronous iterator of event dictionaries: "mirror_planned", then "unlinked", "linked" or "failed".
+    """
+    if link_mode not in LINK_MODES:
+        raise ValueError(f"Unknown link mode - {link_mode}")
+
+    source = Path(source)
+    destination = Path(destination)
+    if source.resolve() == destination.resolve():
+        raise ValueError("The mirror must be built in a different directory")
+
+    await run_blocking(
+        destination.mkdir, parents=True, exist_ok=True, executor=executor
+    )
+    kept, stale, wanted, unreadable, total = await run_blocking(
+        plan_mirror, source, destination, planner, executor=executor
+    )
+    yield {
+        "event": "mirror_planned",
+        "source": str(source),
+        "destination": str(destination),
+        "total": total,
+        "unchanged": len(kept),
+    }
+    for event in unreadable:
+        yield event
+
+    files = dict(kept)
+    try:
+        unlink_jobs = ((index, unlink_item, path) for index, path in enumerate(stale))
+        async with aclosing(run_window(unlink_jobs, executor)) as results:
+            async for _, event in results:
+                yield event
+        await run_blocking(remove_empty_folders, stale, executor=executor)
+
+        # Names are resolved after the stale links are gone, so a changed file gets its old name back
+        names = list(wanted)
+        moves, _ = await run_blocking(
+            resolve_destinations,
+            [
+                (wanted[name][0], str(destination / wanted[name][1] / name))
+                for name in names
+            ],
+            "rename",
+            executor=executor,
+        )
+        await run_blocking(create_folders, [dest for _, dest in moves], executor=executor)
+
+        disabled = set()
+        link_jobs = (
+            (index, link_item, path, dest, link_mode, disabled)
+            for index, (path, dest) in enumerate(moves)
+        )
+        async with aclosing(run_window(link_jobs, executor)) as results:
+            async for index, event in results:
+                if event["event"] == "linked":
+                    name = names[index]
+                    files[name] = {
+                        "folder": wanted[name][1],
+                        "destination": os.path.relpath(event["destination"], destination),
+                        "signature": wanted[name][2],
+                    }
+                yield event
+    finally:
+        write_manifest(destination, source, files)
+
+
+async def mirror_files(
+    source: Path,
+    destination: Path,
+    planner: Callable[[list[os.DirEntry]], list[str]],
+    link_mode: str = "auto",
+    on_event: Callable[[dict], None] | None = None,
+    executor: Executor | None = None,
+) -> dict:
+    """
+    The function builds or refreshes a sorted mirror and collects the events into a single result.
+    :param source: Directory to mirror.
+    :param destination: Root directory of the mirror.
+    :param planner: Function that returns the folder name for every file.
+    :param link_mode: One of LINK_MODES.
+    :param on_event: Optional callback that receives every event as it happens.
+    :param executor: The executor for blocking calls. The shared thread pool is used if not specified.
+    :return: Result dictionary with the keys "source", "destination", "total", "unchanged", "linked" (number of links per method), "unlinked" and "failed" (list of failure events).
+    """
+    result = {
+        "source": str(source),
+        "destination": str(destination),
+        "total": 0,
+        "unchanged": 0,
+        "linked": {},
+        "unlinked": 0,
+        "failed": [],
+    }
+    events = mirror_events(source, destination, planner, link_mode, executor)
+    async with aclosing(events) as events:
+        async for event in events:
+            if on_event:
+                on_event(event)
+
+            if event["event"] == "mirror_planned":
+                result["total"] = event["total"]
+                result["unchanged"] = event["unchanged"]
+            elif event["event"] == "linked":
+                method = event["method"]
+                result["linked"][method] = result["linked"].get(method, 0) + 1
+            elif event["event"] == "unlinked":
+                result["unlinked"] += 1
+            elif event["event"] == "failed":
+                result["failed"].append(event)
+    return result
+
+
+async def async_mirror_by_file_type(
+    source: Path,
+    destination: Path,
+    link_mode: str = "auto",
+    on_event: Callable[[dict], None] | None = None,
+    executor: Executor | None = None,
+) -> dict:
+    """
+    The function builds or refreshes a mirror of a directory sorted by file type. See mirror_files for the result.
+    :param source: Directory to mirror.
+    :param destination: Root directory of the mirror.
+    :param link_mode: "auto", "reflink", "hardlink" or "symlink".
+    :param on_event: Optional callback that receives every event as it happens.
+    :param executor: The executor for blocking calls. The shared thread pool is used if not specified.
+    :return: Result dictionary of the mirror.
+    """
+    return await mirror_files(
+        source, destination, plan_by_file_type, link_mode, on_event, executor
+    )
+
+
+async def async_mirror_by_file_date(
+    source: Path,
+    destination: Path,
+    granularity: str = "month",
+    timestamp_source: str = "mtime",
+    link_mode: str = "auto",
+    on_event: Callable[[dict], None] | None = None,
+    executor: Executor | None = None,
+) -> dict:
+    """
+    The function builds or refreshes a mirror of a directory sorted by file date. See mirror_files for the result.
+    :param source: Directory to mirror.
+    :param destination: Root directory of the mirror.
+    :param granularity: Folder granularity: "day", "week", "month", "quarter" or "year".
+    :param timestamp_source: Timestamp of the file: "mtime", "ctime" or "birth".
+    :param link_mode: "auto", "reflink", "hardlink" or "symlink".
+    :param on_event: Optional callback that receives every event as it happens.
+    :param executor: The executor for blocking calls. The shared thread pool is used if not specified.
+    :return: Result dictionary of the mirror.
+    """
+    planner = partial(
+        plan_by_file_date, granularity=granularity, source=timestamp_source
+    )
+    return await mirror_files(
+        source, destination, planner, link_mode, on_event, executor
+    )
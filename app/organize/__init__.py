@@ -1,3 +1,4 @@
 from .task_organize import *
+from .task_search import *
 
-__all__ = ["load_tasks", "create_task", "add_task", "view_tasks", "find_task","check_empty", "check_task_number_input", "editing_task_title", "editing_task_status", "remove_task", "get_task_title"]
\ No newline at end of file
+__all__ = ["load_tasks", "refresh_tasks", "create_task", "add_task", "view_tasks", "find_task","check_empty", "check_task_number_input", "editing_task_title", "editing_task_status", "remove_task", "get_task_title", "search_tasks"]
\ No newline at end of file
@@ -1,13 +1,43 @@
 from pathlib import Path
+from contextlib import contextmanager
 from datetime import datetime
+from typing import Iterator
 import pickle
 from app.logs import logger
+from app.organize.task_search import (
+    index_task,
+    merge_tasks,
+    reindex_status,
+    reindex_title,
+    unindex_task,
+)
+from app.organize.task_store import atomic_write, file_signature, locked
 
 
 # Creating a path to the file for storing user tasks
 folder_path = Path(__file__).resolve().parent
 tasks_file_path = folder_path / "tasks.bin"
 
+# Signature of the task file as this process last read or wrote it
+_store = {"signature": None}
+
+
+def read_tasks() -> list:
+    """
+    The function reads the task list from the file and remembers the file signature for change detection.
+    :return tasks(list): User task list
+    """
+    signature = file_signature(tasks_file_path)
+    try:
+        with tasks_file_path.open("rb") as file:
+            tasks = pickle.load(file)
+    except EOFError:
+        logger.info("An empty list has been created for task storage and management.")
+        tasks = []
+
+    _store["signature"] = signature
+    return tasks
+
 
 def load_tasks() -> list:
     """
@@ -15,22 +45,43 @@ def load_tasks() -> list:
     :return new_tasks_list(list): User task list
     """
     tasks_file_path.parent.mkdir(parents=True, exist_ok=True)
-    new_tasks_list = []
-
-    if tasks_file_path.exists():
-        try:
-            with tasks_file_path.open("rb") as file:
-                return pickle.load(file)
-        except EOFError:
-            logger.info(
-                "An empty list has been created for task storage and management."
-            )
-            return new_tasks_list
 
-    else:
-        with tasks_file_path.open("wb") as file:
-            pickle.dump(new_tasks_list, file)
-        return new_tasks_list
+    if not tasks_file_path.exists():
+        with locked(tasks_file_path):
+            if not tasks_file_path.exists():
+                save_tasks([])
+
+    return read_tasks()
+
+
+def refresh_tasks(database: list[dict]) -> bool:
+    """
+    The function reloads the task list in place if another process has changed the file since this process last read or wrote it. The check costs a single stat call, and only the changed tasks are updated in the search index.
+    :param database: User task list as a list of dictionaries.
+    :return: True if the task list was reloaded, otherwise False.
+    """
+    if file_signature(tasks_file_path) == _store["signature"]:
+        return False
+
+    merge_tasks(database, read_tasks())
+    logger.info("The task list was changed by another process and has been reloaded.")
+    return True
+
+
+@contextmanager
+def store_transaction(database: list[dict]) -> Iterator[dict]:
+    """
+    The function locks the task file, brings the task list up to date with changes of other processes, and saves it after the block, so that concurrent changes are not overwritten.
+    The block sets "changed" to False in the yielded dictionary if it left the list as it was, so the file is not rewritten and other processes do not reload it.
+    :param database: User task list as a list of dictionaries.
+    :return: Context manager for changing the task list.
+    """
+    with locked(tasks_file_path):
+        refresh_tasks(database)
+        transaction = {"changed": True}
+        yield transaction
+        if transaction["changed"]:
+            save_tasks(database)
 
 
 def create_task(database: list[dict], user_task: str) -> dict:
@@ -54,12 +105,12 @@ def create_task(database: list[dict], user_task: str) -> dict:
 
 def save_tasks(database: list[dict]) -> None:
     """
-    The function takes a task list in the form of a list of dictionaries and writes it to a file.
+    The function takes a task list in the form of a list of dictionaries and writes it to a file. The file is replaced atomically; other processes are kept out by store_transaction.
     :param database: User task list as a list of dictionaries.
     :return: None
     """
-    with tasks_file_path.open("wb") as file:
-        pickle.dump(database, file)
+    atomic_write(tasks_file_path, pickle.dumps(database))
+    _store["signature"] = file_signature(tasks_file_path)
 
 
 def add_task(database: list[dict], task: dict) -> None:
@@ -69,8 +120,10 @@ def add_task(database: list[dict], task: dict) -> None:
     :param task: A dictionary where the keys are task ID ("id"), task text ("title"), task creation time ("time_created"), and task status ("status").
     :return: None
     """
-    database.append(task)
-    save_tasks(database)
+    with store_transaction(database):
+        task["id"] = str(len(database) + 1)
+        database.append(task)
+        index_task(database, task)
 
 
 def view_tasks(database: list[dict]) -> None:
@@ -144,50 +197,108 @@ def get_task_title(database: list[dict], id_task: str) -> str:
     return find_task(database, id_task)["title"]
 
 
-def editing_task_title(database: list[dict], id_task: str, new_task: str) -> None:
+def task_identity(task: dict) -> tuple[str, str]:
+    """
+    The function returns what identifies a task regardless of its ID, which changes when tasks are renumbered.
+    :param task: User task dictionary.
+    :return: Tuple of the creation time and the title of the task.
+    """
+    return task["time_created"], task["title"]
+
+
+def find_same_task(database: list[dict], id_task: str, identity: tuple[str, str]) -> dict | None:
+    """
+    The function finds a task by its ID after the task list was reloaded and checks that it is still the task the user chose. If another process deleted or changed it, a warning is displayed.
+    :param database: User task list as a list of dictionaries.
+    :param id_task: Task ID the user chose.
+    :param identity: Identity of the chosen task taken before the reload (see task_identity).
+    :return: The task, or None if the ID now belongs to another task or to no task.
+    """
+    task = find_task(database, id_task)
+    if task is None or task_identity(task) != identity:
+        print(f"\nTask number {id_task} was changed or deleted by another user. Nothing was changed.")
+        logger.warning(
+            f"Task number {id_task} was changed or deleted by another process, the change was cancelled."
+        )
+        print()
+        return None
+    return task
+
+
+def editing_task_title(database: list[dict], id_task: str, new_task: str) -> bool:
     """
     The function takes a task list, a task ID, and new text for editing, and replaces the task's text with the new text.
     :param database: User task list as a list of dictionaries.
     :param id_task: Task ID.
     :param new_task: New task text.
-    :return: None
+    :return: True if the task was edited, False if it no longer exists or was changed by another process.
     """
     task = find_task(database, id_task)
-    task["title"] = new_task
-    save_tasks(database)
+    if task is None:
+        return False
 
+    identity = task_identity(task)
+    with store_transaction(database) as transaction:
+        task = find_same_task(database, id_task, identity)
+        if task is None:
+            transaction["changed"] = False
+            return False
 
-def editing_task_status(database: list[dict], id_task: str, new_status: str) -> None:
+        old_title = task["title"]
+        task["title"] = new_task
+        reindex_title(database, task, old_title)
+    return True
+
+
+def editing_task_status(database: list[dict], id_task: str, new_status: str) -> bool:
     """
     The function takes a task list, a task ID, and a new status for editing the task, and replaces the task's status with the new one.
     :param database: User task list as a list of dictionaries.
     :param id_task: Task ID.
     :param new_status: New task status.
-    :return: None
+    :return: True if the task was edited, False if it no longer exists or was changed by another process.
     """
     task = find_task(database, id_task)
-    task["status"] = new_status
-    save_tasks(database)
+    if task is None:
+        return False
+
+    identity = task_identity(task)
+    with store_transaction(database) as transaction:
+        task = find_same_task(database, id_task, identity)
+        if task is None:
+            transaction["changed"] = False
+            return False
 
+        old_status = task["status"]
+        task["status"] = new_status
+        reindex_status(database, task, old_status)
+    return True
 
-def remove_task(database: list[dict], id_task: str) -> bool | None:
+
+def remove_task(database: list[dict], id_task: str) -> bool:
     """
     The function takes a task list and a task ID, checks if the task exists in the list, and deletes it if present. If a task with that ID is not found, it displays a warning. After deleting the task, the function renumbers the remaining tasks sequentially: 1, 2, 3, 4…
     :param database: User task list as a list of dictionaries.
     :param id_task: Task ID.
-    :return: False if task does not exist in the database.
+    :return: False if task does not exist in the database or was changed by another process, otherwise True.
     """
     task = find_task(database, id_task)
-    if task:
-        database.remove(task)
-    else:
+    if task is None:
         print(f"\nTask number {id_task} is not found in the database.")
         logger.warning(f"Task number {id_task} is not found in the list.")
         print()
         return False
 
-    for index, task in enumerate(database, start=1):
-        task["id"] = str(index)
+    identity = task_identity(task)
+    with store_transaction(database) as transaction:
+        task = find_same_task(database, id_task, identity)
+        if task is None:
+            transaction["changed"] = False
+            return False
+
+        unindex_task(database, task)
+        database.remove(task)
+        for index, task in enumerate(database, start=1):
+            task["id"] = str(index)
 
-    save_tasks(database)
     return True
@@ -0,0 +1,289 @@
+import re
+from bisect import bisect_left, insort
+
+
+# Inverted index of the task list. Every task gets a sequence number in list order, and postings map
+# these numbers to tasks in ascending order, so results come out ordered by ID without sorting.
+# Renumbering the tasks does not touch the index.
+_index = {
+    "database": None,
+    "tasks": {},
+    "keys": {},
+    "next": 0,
+    "postings": {},
+    "vocabulary": [],
+    "statuses": {},
+    "unordered": set(),
+}
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    The function splits a text into lowercase words.
+    :param text: Task title or search query.
+    :return: List of words.
+    """
+    return re.findall(r"\w+", text.lower())
+
+
+def add_posting(postings: dict, name: str, key: int, task: dict) -> None:
+    """
+    The function adds a task to a posting. A task added before the last one (after an edit) marks the posting to be put back in order on the next search.
+    :param postings: Postings of words or statuses.
+    :param name: Word or status.
+    :param key: Sequence number of the task.
+    :param task: User task dictionary.
+    :return: None
+    """
+    posting = postings.setdefault(name, {})
+    if posting and key < next(reversed(posting)):
+        _index["unordered"].add(id(posting))
+    posting[key] = task
+
+
+def ordered(posting: dict) -> dict:
+    """
+    The function returns a posting in ascending order of sequence numbers, sorting it only if it was changed out of order.
+    :param posting: Posting of a word or status.
+    :return: The same posting.
+    """
+    if id(posting) in _index["unordered"]:
+        items = sorted(posting.items(), key=lambda item: item[0])
+        posting.clear()
+        posting.update(items)
+        _index["unordered"].discard(id(posting))
+    return posting
+
+
+def add_words(task: dict) -> None:
+    """
+    The function adds the words of a task title to the index.
+    :param task: User task dictionary.
+    :return: None
+    """
+    key = _index["keys"][id(task)]
+    for word in set(tokenize(task["title"])):
+        if word not in _index["postings"]:
+            insort(_index["vocabulary"], word)
+        add_posting(_index["postings"], word, key, task)
+
+
+def remove_words(task: dict, title: str) -> None:
+    """
+    The function removes the words of a task title from the index.
+    :param task: User task dictionary.
+    :param title: The title the task was indexed with.
+    :return: None
+    """
+    key = _index["keys"][id(task)]
+    for word in set(tokenize(title)):
+        posting = _index["postings"].get(word)
+        if posting is None:
+            continue
+
+        posting.pop(key, None)
+        if not posting:
+            _index["unordered"].discard(id(posting))
+            del _index["postings"][word]
+            vocabulary = _index["vocabulary"]
+            del vocabulary[bisect_left(vocabulary, word)]
+
+
+def build_index(database: list[dict]) -> None:
+    """
+    The function builds the search index for a task list from scratch.
+    :param database: User task list as a list of dictionaries.
+    :return: None
+    """
+    tasks = {}
+    keys = {}
+    postings = {}
+    statuses = {}
+    for key, task in enumerate(database):
+        tasks[key] = task
+        keys[id(task)] = key
+        statuses.setdefault(task["status"], {})[key] = task
+        for word in tokenize(task["title"]):
+            postings.setdefault(word, {})[key] = task
+
+    _index.update(
+        database=database,
+        tasks=tasks,
+        keys=keys,
+        next=len(database),
+        postings=postings,
+        vocabulary=sorted(postings),
+        statuses=statuses,
+        unordered=set(),
+    )
+
+
+def use_index(database: list[dict]) -> None:
+    """
+    The function makes sure the search index belongs to the given task list, rebuilding it if it was built for another list.
+    :param database: User task list as a list of dictionaries.
+    :return: None
+    """
+    if _index["database"] is not database:
+        build_index(database)
+
+
+def index_task(database: list[dict], task: dict) -> None:
+    """
+    The function adds a new task to the end of the search index.
+    :param database: User task list as a list of dictionaries.
+    :param task: User task dictionary.
+    :return: None
+    """
+    use_index(database)
+    if id(task) in _index["keys"]:
+        return
+
+    key = _index["next"]
+    _index["next"] += 1
+    _index["tasks"][key] = task
+    _index["keys"][id(task)] = key
+    add_posting(_index["statuses"], task["status"], key, task)
+    add_words(task)
+
+
+def unindex_task(database: list[dict], task: dict) -> None:
+    """
+    The function removes a task from the search index.
+    :param database: User task list as a list of dictionaries.
+    :param task: User task dictionary.
+    :return: None
+    """
+    use_index(database)
+    key = _index["keys"].get(id(task))
+    if key is None:
+        return
+
+    _index["statuses"].get(task["status"], {}).pop(key, None)
+    remove_words(task, task["title"])
+    del _index["tasks"][key]
+    del _index["keys"][id(task)]
+
+
+def reindex_title(database: list[dict], task: dict, old_title: str) -> None:
+    """
+    The function updates the search index after a task title has changed.
+    :param database: User task list as a list of dictionaries.
+    :param task: User task dictionary with the new title.
+    :param old_title: The previous title of the task.
+    :return: None
+    """
+    use_index(database)
+    remove_words(task, old_title)
+    add_words(task)
+
+
+def reindex_status(database: list[dict], task: dict, old_status: str) -> None:
+    """
+    The function updates the search index after a task status has changed.
+    :param database: User task list as a list of dictionaries.
+    :param task: User task dictionary with the new status.
+    :param old_status: The previous status of the task.
+    :return: None
+    """
+    use_index(database)
+    key = _index["keys"][id(task)]
+    _index["statuses"].get(old_status, {}).pop(key, None)
+    add_posting(_index["statuses"], task["status"], key, task)
+
+
+def merge_tasks(database: list[dict], tasks: list[dict]) -> None:
+    """
+    The function replaces the content of a task list with a newer copy read from the file. If the list is indexed, only the tasks that were added, deleted or edited are updated in the index, instead of building it again.
+    Other processes only append and delete tasks, so both lists are walked side by side and tasks are matched by their creation time.
+    :param database: User task list as a list of dictionaries.
+    :param tasks: The newer task list.
+    :return: None
+    """
+    if _index["database"] is not database:
+        database[:] = tasks
+        return
+
+    old_tasks = list(database)
+    merged = []
+    position = 0
+    for task in tasks:
+        while (
+            position < len(old_tasks)
+            and old_tasks[position]["time_created"] != task["time_created"]
+        ):
+            unindex_task(database, old_tasks[position])
+            position += 1
+
+        if position == len(old_tasks):
+            index_task(database, task)
+            merged.append(task)
+            continue
+
+        current = old_tasks[position]
+        position += 1
+        current["id"] = task["id"]
+        if current["title"] != task["title"]:
+            old_title = current["title"]
+            current["title"] = task["title"]
+            reindex_title(database, current, old_title)
+        if current["status"] != task["status"]:
+            old_status = current["status"]
+            current["status"] = task["status"]
+            reindex_status(database, current, old_status)
+        merged.append(current)
+
+    for task in old_tasks[position:]:
+        unindex_task(database, task)
+    database[:] = merged
+
+
+def match_prefix(prefix: str) -> dict | set[int]:
+    """
+    The function returns the tasks that have a word starting with the prefix.
+    :param prefix: Beginning of a word in lowercase.
+    :return: The posting of the word in ID order if a single word matches, otherwise an unordered set of sequence numbers.
+    """
+    vocabulary = _index["vocabulary"]
+    position = bisect_left(vocabulary, prefix)
+    words = []
+    while position < len(vocabulary) and vocabulary[position].startswith(prefix):
+        words.append(vocabulary[position])
+        position += 1
+
+    if len(words) == 1:
+        return ordered(_index["postings"][words[0]])
+
+    keys = set()
+    for word in words:
+        keys.update(_index["postings"][word])
+    return keys
+
+
+def search_tasks(database: list[dict], query: str, status: str | None = None) -> list[dict]:
+    """
+    The function finds the tasks whose titles contain every word of the query. Each query word also matches longer words that start with it, e.g. "groc" finds "groceries".
+    A query that comes down to a single posting returns it as it is; otherwise the postings are intersected and the matching sequence numbers are put in order.
+    :param database: User task list as a list of dictionaries.
+    :param query: Search words. An empty query matches every task.
+    :param status: Optional task status ("in progress", "done" or "paused") the found tasks must have.
+    :return: Found tasks ordered by their ID.
+    """
+    use_index(database)
+    word_matches = [match_prefix(word) for word in set(tokenize(query))]
+    if status is not None:
+        word_matches.append(ordered(_index["statuses"].get(status, {})))
+
+    if not word_matches:
+        return list(_index["tasks"].values())
+
+    word_matches.sort(key=len)
+    first, others = word_matches[0], word_matches[1:]
+    if not others and isinstance(first, dict):
+        return list(first.values())
+
+    # A set returned by match_prefix is new, so it is narrowed in place; a posting is copied
+    keys = first if isinstance(first, set) else set(first)
+    keys.intersection_update(*others)
+    tasks = _index["tasks"]
+    return [tasks[key] for key in sorted(keys)]
@@ -0,0 +1,98 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterator
+
+try:
+    import fcntl
+except ImportError:
+    # fcntl is not available on Windows, where msvcrt byte-range locks are used instead
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+
+def acquire_lock(lock_file: IO) -> None:
+    """
+    The function waits until it holds an exclusive lock on an open lock file: flock on POSIX, a lock on the first byte with msvcrt on Windows.
+    :param lock_file: The lock file opened for appending.
+    :return: None
+    """
+    if fcntl is not None:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+    elif msvcrt is not None:
+        lock_file.seek(0)
+        while True:
+            try:
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                # LK_LOCK gives up after about ten seconds; keep waiting for the other process
+                continue
+
+
+def release_lock(lock_file: IO) -> None:
+    """
+    The function releases the lock taken by acquire_lock.
+    :param lock_file: The lock file opened for appending.
+    :return: None
+    """
+    if fcntl is not None:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+    elif msvcrt is not None:
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def locked(path: Path) -> Iterator[None]:
+    """
+    The function holds an exclusive lock for a file, so that only one process at a time can change it. The lock is taken on a separate ".lock" file, because the file itself is replaced on every write.
+    :param path: Path to the file to protect.
+    :return: Context manager that holds the lock.
+    """
+    lock_path = path.with_name(path.name + ".lock")
+    with lock_path.open("a") as lock_file:
+        acquire_lock(lock_file)
+        try:
+            yield
+        finally:
+            release_lock(lock_file)
+
+
+def atomic_write(path: Path, data: bytes) -> None:
+    """
+    The function writes data to a temporary file next to the target and renames it over the target, so readers see either the old or the new content and never a partial write.
+    :param path: Path to the file.
+    :param data: New content of the file.
+    :return: None
+    """
+    descriptor, temporary_path = tempfile.mkstemp(
+        dir=path.parent, prefix=path.name + ".", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, path)
+    except BaseException:
+        Path(temporary_path).unlink(missing_ok=True)
+        raise
+
+
+def file_signature(path: Path) -> tuple | None:
+    """
+    The function returns a cheap fingerprint of a file. Every atomic write creates a new file, so the fingerprint changes whenever another process commits.
+    :param path: Path to the file.
+    :return: Tuple of inode, modification time in nanoseconds and size, or None if the file does not exist.
+    """
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
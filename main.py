@@ -35,15 +35,24 @@ def main() -> None:
        - Allows deleting multiple tasks in one session.
 
     5. File operations
-       - Sort files in a directory by type (extension) or modification date.
+       - Sort files in a directory by type (extension) or date (day, week, month, quarter, or year).
+       - Choose what happens to files whose name is already taken: skip, overwrite, rename, or skip identical files.
+       - Build a sorted mirror of a directory in another directory using reflinks, hard links, or symbolic links, without changing the source.
+       - Resume an interrupted sort and undo the last sort using the sort journal. A sort with other settings does not silently finish an interrupted one: the user chooses to resume, undo, or discard it.
        - Read and display the contents of text, log, or binary files.
+       - Search the text files of a directory tree for a text or regular expression.
+       - Archive sorted folders (e.g. months older than N months) into tar.gz or zip bundles, list them, and extract single files.
        - Delete files or directories (with optional recursive deletion for directories containing files).
 
-    6. Exit
+    6. Search tasks
+       - Finds tasks by words or word beginnings in the title, optionally filtered by status.
+
+    7. Exit
        - Closes the program.
 
     Additional features:
     - Persistent task storage using a binary file (`tasks.bin`) with automatic loading and saving.
+    - Safe use by several copies of the program at once: writes are locked and atomic, and changes made by another copy are reloaded automatically.
     - Logging of all user actions, warnings, and errors to a log file (`app.log`) and the console.
     - Input validation to ensure correct task IDs, menu selections, and file/directory paths.
     :return: None
@@ -55,18 +64,20 @@ def main() -> None:
         "3. Edit task\n"
         "4. Delete task\n"
         "5. File operations\n"
-        "6. Exit"
+        "6. Search tasks\n"
+        "7. Exit"
     )
 
     database_tasks = load_tasks()
 
     while True:
+        refresh_tasks(database_tasks)
         print(base_menu)
         logger.info(f"Main menu displayed: {[item for item in base_menu.split('\n')]}")
         user_input = input("Select an action and enter its number: ").strip()
         print()
 
-        catalog = ("1", "2", "3", "4", "5", "6")
+        catalog = ("1", "2", "3", "4", "5", "6", "7")
         if check_match_catalog(user_input, catalog):
             continue
 
@@ -145,11 +156,11 @@ def main() -> None:
                             .capitalize()
                             .strip()
                         )
-                        editing_task_title(database_tasks, id_task, replace_task)
-                        logger.info(
-                            f"Task edited successfully: {old_title} -> {replace_task}."
-                        )
-                        print("Task successfully updated.\n")
+                        if editing_task_title(database_tasks, id_task, replace_task):
+                            logger.info(
+                                f"Task edited successfully: {old_title} -> {replace_task}."
+                            )
+                            print("Task successfully updated.\n")
 
                         if not ask_continue(PROMPT_EDIT_ANOTHER):
                             break
@@ -177,11 +188,11 @@ def main() -> None:
 
                         break
 
-                    editing_task_status(database_tasks, id_task, new_status)
-                    logger.info(
-                        f"Task status changed successfully {old_status} -> {new_status}."
-                    )
-                    print("Task successfully updated.\n")
+                    if editing_task_status(database_tasks, id_task, new_status):
+                        logger.info(
+                            f"Task status changed successfully {old_status} -> {new_status}."
+                        )
+                        print("Task successfully updated.\n")
 
                     if not ask_continue(PROMPT_EDIT_ANOTHER):
                         break
@@ -205,9 +216,9 @@ def main() -> None:
                 logger.info(
                     f"User selected to delete task number {id_task} - '{task_title}'."
                 )
-                remove_task(database_tasks, id_task)
-                logger.info(f"Task '{task_title}' deleted successfully.")
-                print(f"Deleted task '{task_title}' successfully.\n")
+                if remove_task(database_tasks, id_task):
+                    logger.info(f"Task '{task_title}' deleted successfully.")
+                    print(f"Deleted task '{task_title}' successfully.\n")
 
                 if not ask_continue(PROMPT_DELETE_ANOTHER):
                     break
@@ -221,14 +232,28 @@ def main() -> None:
                 "1. Sort files\n"
                 "2. Read files\n"
                 "3. Delete directory or file\n"
-                "4. Back"
+                "4. Search in files\n"
+                "5. Archive sorted folders\n"
+                "6. Back"
+            )
+
+            menu_archive = (
+                "\n--- Archive Menu ---\n"
+                "1.Archive date folders older than N months\n"
+                "2.Archive folders by name\n"
+                "3.List files in a bundle\n"
+                "4.Extract a file from a bundle\n"
+                "5.Back"
             )
 
             menu_sort_files = (
                 "\n--- Sort File Menu ---\n"
                 "1.Sort by file type\n"
                 "2.Sort by date\n"
-                "3.Back"
+                "3.Mirror by file type into another directory\n"
+                "4.Mirror by date into another directory\n"
+                "5.Undo last sort\n"
+                "6.Back"
             )
 
             while True:
@@ -240,7 +265,7 @@ def main() -> None:
                 user_input = input(
                     "Select an action to work with files and enter its number: "
                 ).strip()
-                prompt = ("1", "2", "3", "4")
+                prompt = ("1", "2", "3", "4", "5", "6")
                 if check_match_catalog(user_input, prompt):
                     continue
 
@@ -256,11 +281,11 @@ def main() -> None:
                         sorting_option = input(
                             "Choose a sorting option and enter its number: "
                         ).strip()
-                        prompt = ("1", "2", "3")
+                        prompt = ("1", "2", "3", "4", "5", "6")
                         if check_match_catalog(sorting_option, prompt):
                             continue
 
-                        if sorting_option == "3":
+                        if sorting_option == "6":
                             logger.info(
                                 f"User selected Back, returning to the file operations menu - {[item for item in menu_work_with_files.split('\n')]}"
                             )
@@ -277,19 +302,110 @@ def main() -> None:
                                 break
 
                             path_directory = to_path(path_for_sort)
+                            if sorting_option in ("1", "2"):
+                                collision = ask_choice(
+                                    "If a file with the same name exists skip/overwrite/rename/skip_identical (default skip): ",
+                                    COLLISION_POLICIES,
+                                    "skip",
+                                )
+                                logger.info(
+                                    f"User selected collision policy '{collision}'."
+                                )
+
                             if sorting_option == "1":
                                 logger.info(
                                     "User selected the action to sort files by type (extension)."
                                 )
 
-                                sort_by_file_type(path_directory)
+                                started = sort_by_file_type(path_directory, collision)
 
                             if sorting_option == "2":
                                 logger.info(
                                     "User selected the action to sort files by date."
                                 )
 
-                                sort_by_file_date(path_directory)
+                                granularity = ask_choice(
+                                    "Group files by day/week/month/quarter/year (default month): ",
+                                    GRANULARITIES,
+                                    "month",
+                                )
+                                source = ask_choice(
+                                    "Use the date of mtime/ctime/birth (default mtime): ",
+                                    TIMESTAMP_SOURCES,
+                                    "mtime",
+                                )
+                                logger.info(
+                                    f"User selected granularity '{granularity}' and timestamp '{source}'."
+                                )
+
+                                started = sort_by_file_date(
+                                    path_directory, granularity, source, collision
+                                )
+
+                            if sorting_option in ("1", "2") and not started:
+                                action = ask_choice(
+                                    "Resume the interrupted sort, undo it, or discard its journal? resume/undo/discard/cancel (default cancel): ",
+                                    ("resume", "undo", "discard", "cancel"),
+                                    "cancel",
+                                )
+                                logger.info(
+                                    f"User selected '{action}' for the interrupted sort."
+                                )
+                                if action == "resume":
+                                    resume_sort(path_directory)
+                                elif action == "undo":
+                                    undo_sort(path_directory)
+                                elif action == "discard":
+                                    discard_sort(path_directory)
+
+                            if sorting_option in ("3", "4"):
+                                path_for_mirror = input(
+                                    r"Enter the absolute path of the directory for the mirror: "
+                                )
+                                path_mirror = to_path(path_for_mirror)
+                                link_mode = ask_choice(
+                                    "Link files with auto/reflink/hardlink/symlink (default auto): ",
+                                    LINK_MODES,
+                                    "auto",
+                                )
+                                logger.info(
+                                    f"User selected to mirror {path_directory} into {path_mirror} using '{link_mode}'."
+                                )
+
+                                try:
+                                    if sorting_option == "3":
+                                        mirror_by_file_type(
+                                            path_directory, path_mirror, link_mode
+                                        )
+                                    else:
+                                        granularity = ask_choice(
+                                            "Group files by day/week/month/quarter/year (default month): ",
+                                            GRANULARITIES,
+                                            "month",
+                                        )
+                                        source = ask_choice(
+                                            "Use the date of mtime/ctime/birth (default mtime): ",
+                                            TIMESTAMP_SOURCES,
+                                            "mtime",
+                                        )
+                                        mirror_by_file_date(
+                                            path_directory,
+                                            path_mirror,
+                                            granularity,
+                                            source,
+                                            link_mode,
+                                        )
+                                except (ValueError, OSError) as error:
+                                    print(f"\nMirror error – {error}.")
+                                    logger.error(f"Mirror error – {error}.")
+                                    print()
+
+                            if sorting_option == "5":
+                                logger.info(
+                                    "User selected the action to undo the last sort."
+                                )
+
+                                undo_sort(path_directory)
 
                 elif user_input == "2":
                     logger.info("User selected the file reading action.")
@@ -326,14 +442,14 @@ def main() -> None:
                                 )
 
                                 if answer == "yes":
-                                    remove_file(path_to_remove, recursive=True)
-                                    print("Deletion was successful at the path — {path_to_remove}\n")
                                     logger.info(
                                         "The user chose to delete the directory along with its contents."
                                     )
-                                    logger.info(
-                                        f"Deletion was successful at the path — {path_to_remove}"
-                                    )
+                                    if remove_file(path_to_remove, recursive=True):
+                                        print(f"Deletion was successful at the path — {path_to_remove}\n")
+                                        logger.info(
+                                            f"Deletion was successful at the path — {path_to_remove}"
+                                        )
                                     break
 
                                 elif answer == "no":
@@ -354,19 +470,148 @@ def main() -> None:
                             break
 
                         else:
-                            remove_file(path_to_remove, recursive=False)
+                            if remove_file(path_to_remove, recursive=False):
+                                logger.info(
+                                    f"File deletion at the specified path was successful — {path_to_remove}"
+                                )
+                            break
+
+                elif user_input == "4":
+                    logger.info("User selected the file search action.")
+                    while True:
+                        path_for_search = input(
+                            r"Enter the absolute path of the directory to search in: "
+                        )
+                        if is_valid_directory(to_path(path_for_search)):
+                            continue
+
+                        break
+
+                    pattern = input("Enter the text or regular expression to find: ")
+                    if not pattern:
+                        print("\nSearch text cannot be empty!\n")
+                        logger.warning("User entered an empty search text.")
+                        continue
+
+                    is_regex = ask_yes_no("Is it a regular expression? yes/no: ") == "yes"
+                    logger.info(
+                        f"User searched for '{pattern}' (regex: {is_regex}) in {path_for_search}."
+                    )
+                    print()
+                    search_in_files(to_path(path_for_search), pattern, is_regex)
+
+                elif user_input == "5":
+                    logger.info("User selected the archive action.")
+                    while True:
+                        print(menu_archive)
+                        logger.debug(
+                            f"User opened the archive menu - {[item for item in menu_archive.split('\n')]}"
+                        )
+
+                        archive_option = input(
+                            "Choose an archive option and enter its number: "
+                        ).strip()
+                        prompt = ("1", "2", "3", "4", "5")
+                        if check_match_catalog(archive_option, prompt):
+                            continue
+
+                        if archive_option == "5":
                             logger.info(
-                                f"File deletion at the specified path was successful — {path_to_remove}"
+                                "User selected Back, returning to the file operations menu."
                             )
                             break
 
-                elif user_input == "4":
+                        if archive_option in ("1", "2"):
+                            while True:
+                                path_for_archive = input(
+                                    r"Enter the absolute path of the sorted directory: "
+                                )
+                                if is_valid_directory(to_path(path_for_archive)):
+                                    continue
+
+                                break
+
+                            path_directory = to_path(path_for_archive)
+                            if archive_option == "1":
+                                months = input(
+                                    "Archive folders older than how many months: "
+                                ).strip()
+                                if not months.isdigit():
+                                    print(f"\nInvalid value entered - {months}.\n")
+                                    logger.warning(f"Invalid value entered - {months}.")
+                                    continue
+
+                                folders = select_old_folders(path_directory, int(months))
+                            else:
+                                names = input(
+                                    "Enter the folder names separated by commas: "
+                                )
+                                folders = select_folders(
+                                    path_directory,
+                                    [name.strip() for name in names.split(",") if name.strip()],
+                                )
+
+                            archive_format = ask_choice(
+                                "Bundle format tar.gz/zip (default tar.gz): ",
+                                ARCHIVE_FORMATS,
+                                "tar.gz",
+                            )
+                            delete = (
+                                ask_yes_no(
+                                    "Delete the original folders after verification? yes/no: "
+                                )
+                                == "yes"
+                            )
+                            logger.info(
+                                f"User selected to archive {[folder.name for folder in folders]} as {archive_format} (delete: {delete})."
+                            )
+                            archive_sorted_folders(folders, archive_format, delete)
+
+                        else:
+                            path_str = input(r"Enter the absolute path of the bundle: ")
+                            if not is_valid_file(path_str):
+                                continue
+
+                            if archive_option == "3":
+                                list_archive(to_path(path_str))
+                            else:
+                                name = input("Enter the name of the file in the bundle: ").strip()
+                                target = input(
+                                    r"Enter the absolute path of the directory to extract to: "
+                                )
+                                extract_from_archive(to_path(path_str), name, to_path(target))
+
+                elif user_input == "6":
                     logger.info(
                         f"The user selected the 'Back' option to return to the main menu. - {[item for item in base_menu.split('\n')]}"
                     )
                     break
 
         elif user_input == "6":
+            logger.info("User selected action: Search Tasks.")
+            if check_empty(database_tasks):
+                continue
+
+            query = input("Enter the words to search for (empty for all tasks): ").strip()
+            status = ask_choice(
+                "Filter by status any/in progress/done/paused (default any): ",
+                ("any", "in progress", "done", "paused"),
+                "any",
+            )
+            found_tasks = search_tasks(
+                database_tasks, query, None if status == "any" else status
+            )
+            logger.info(
+                f"User searched for '{query}' with status '{status}' - {len(found_tasks)} tasks found."
+            )
+
+            if found_tasks:
+                view_tasks(found_tasks)
+            else:
+                print("\nNo tasks found.")
+            print()
+
+        elif user_input == "7":
             logger.info("The user selected the 'Exit' option to close the program.")
             logger.info("The program has finished its execution.")
             break
@@ -1,3 +1,3 @@
 from .helpers import *
 
-__all__ = ["check_match_catalog", "ask_yes_no", "select_option", "ask_continue"]
\ No newline at end of file
+__all__ = ["check_match_catalog", "ask_yes_no", "ask_choice", "select_option", "ask_continue"]
\ No newline at end of file
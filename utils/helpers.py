@@ -33,6 +33,24 @@ def ask_yes_no(prompt: str) -> str:
         print()
 
 
+def ask_choice(prompt: str, options: tuple, default: str) -> str:
+    """
+    The function asks the user to choose one of the options. An empty answer selects the default option.
+    :param prompt: A template text that lists the options.
+    :param options: Tuple of allowed answers.
+    :param default: The answer used when the user enters nothing.
+    :return user_answer(str): One of the options.
+    """
+    while True:
+        user_answer = input(prompt).lower().strip() or default
+        if user_answer in options:
+            return user_answer
+
+        print(f"\nInvalid input! Please select one of: {', '.join(options)}.")
+        logger.warning(f"User entered invalid value - {user_answer}.")
+        print()
+
+
 def select_option(database: list[dict], prompt: str) -> str:
     """
     The function displays the list of tasks on the screen, asks the user which task they choose, and returns its index in the list.